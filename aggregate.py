@@ -0,0 +1,92 @@
+# Vectorized aggregation of the daily energy data with NumPy
+
+# chain to read the energy values of every row in one pass
+from itertools import chain
+
+# numpy library for typed arrays and grouped sums
+import numpy as np
+
+# batch parser of the daily dates
+from dates import day_ordinals, to_datetime64
+
+# numpy unit of each grouping period: day, week, month or year
+PERIOD_UNITS = {"D": "D", "W": "D", "M": "M", "Y": "Y"}
+
+
+def load_daily_arrays(rows):
+    """
+    Load daily sheet rows into typed columns.
+    Returns the dates as datetime64[D] and an array with a consumed,
+    exported and imported column as float64.
+    """
+    if not rows:
+        return np.array([], dtype="datetime64[D]"), np.zeros((0, 3))
+
+    ordinals = day_ordinals([row[0] for row in rows])
+    if not ordinals.all():
+        bad = rows[int(np.argmin(ordinals))][0]
+        raise ValueError(f"Invalid date in daily data: {bad}")
+    dates = to_datetime64(ordinals)
+
+    energy = np.fromiter(
+        map(float, chain.from_iterable(row[1:4] for row in rows)),
+        np.float64, 3 * len(rows)).reshape(-1, 3)
+    return dates, energy
+
+
+def period_keys(dates, period):
+    """
+    Return the start of the week (Monday), month or year of each date.
+    """
+    if period == "W":
+        # Day 0 of datetime64 is a Thursday, shift back to the Monday
+        weekday = (dates.astype(np.int64) + 3) % 7
+        return dates - weekday.astype("timedelta64[D]")
+    return dates.astype(f"datetime64[{PERIOD_UNITS[period]}]")
+
+
+def group_totals(dates, values, period="M"):
+    """
+    Sum the rows of values for each day ("D"), week ("W"), month ("M") or
+    year ("Y") of dates. Returns the sorted period keys, the totals of
+    each period and the number of rows in each period.
+    """
+    keys = period_keys(dates, period)
+    if not len(keys):
+        return keys, np.zeros((0,) + values.shape[1:]), np.zeros(0, int)
+
+    # Sort by period so each period is one contiguous run of rows
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(
+        np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+
+    totals = np.add.reduceat(values[order], starts, axis=0)
+    counts = np.diff(np.append(starts, len(keys)))
+    return sorted_keys[starts], totals, counts
+
+
+def site_group_totals(sites, dates, values, period="M"):
+    """
+    Sum the rows of values for each site and period of dates in one
+    pass. sites holds an integer site code for each row. Returns the
+    site codes and period keys of each group, sorted by site then
+    period, with the totals and number of rows of each group.
+    """
+    keys = period_keys(dates, period)
+    if not len(keys):
+        return (sites[:0], keys, np.zeros((0,) + values.shape[1:]),
+                np.zeros(0, int))
+
+    # Sort by site, then period, so each group is one contiguous run
+    order = np.lexsort((keys, sites))
+    sorted_sites = sites[order]
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.concatenate((
+        [True],
+        (sorted_sites[1:] != sorted_sites[:-1])
+        | (sorted_keys[1:] != sorted_keys[:-1]))))
+
+    totals = np.add.reduceat(values[order], starts, axis=0)
+    counts = np.diff(np.append(starts, len(keys)))
+    return sorted_sites[starts], sorted_keys[starts], totals, counts
@@ -0,0 +1,106 @@
+# Compare the NumPy monthly aggregation with the original row by row loop
+#
+# Usage: python3 benchmarks/aggregation.py [rows ...]
+# Defaults to 1k, 100k and 1M rows of 15 minute interval data.
+
+# os and sys libraries to import the app modules
+import os
+import sys
+
+# time library to time each aggregation
+import time
+
+# defaultdict library from collections, used by the original loop
+from collections import defaultdict
+
+# datetime library for the original loop and the generated dates
+from datetime import datetime, timedelta
+
+# numpy library for the generated values
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregate import load_daily_arrays, group_totals  # noqa: E402
+
+# 15 minute readings per day
+READINGS_PER_DAY = 96
+
+
+def make_rows(count):
+    """
+    Generate rows of 15 minute readings in the daily sheet format.
+    """
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 2, size=(count, 3)).round(3).astype(str)
+    start = datetime(2015, 1, 1)
+    rows = []
+    for index in range(count):
+        day = start + timedelta(days=index // READINGS_PER_DAY)
+        rows.append([f"{day.day} {day.strftime('%b %Y')}"]
+                    + list(values[index]))
+    return rows
+
+
+def loop_months(rows):
+    """
+    The original calculate_month loop.
+    """
+    grouped_data = defaultdict(lambda: {
+        "consumed": 0,
+        "exported": 0,
+        "imported": 0,
+        "count": 0
+    })
+    for row in rows:
+        daily_date = datetime.strptime(row[0].strip(), "%d %b %Y")
+        month_year = daily_date.strftime("%b %Y")
+        grouped_data[month_year]["consumed"] += float(row[1])
+        grouped_data[month_year]["exported"] += float(row[2])
+        grouped_data[month_year]["imported"] += float(row[3])
+        grouped_data[month_year]["count"] += 1
+    return grouped_data
+
+
+def vector_months(rows):
+    """
+    The NumPy aggregation used by calculate_month.
+    """
+    dates, energy = load_daily_arrays(rows)
+    return group_totals(dates, energy, "M")
+
+
+def timed(function, rows):
+    """
+    Return the result of function and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(rows)
+    return result, time.perf_counter() - start
+
+
+def main():
+    """
+    Time both aggregations at each size and check the totals agree.
+    """
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 100000, 1000000]
+
+    for size in sizes:
+        rows = make_rows(size)
+        loop_result, loop_time = timed(loop_months, rows)
+        (keys, totals, counts), vector_time = timed(vector_months, rows)
+
+        loop_totals = np.array([
+            [info["consumed"], info["exported"], info["imported"]]
+            for info in loop_result.values()])
+        same = (len(loop_result) == len(keys)
+                and np.allclose(loop_totals, totals))
+
+        print(f"{size:>9} rows: loop {loop_time:.3f}s, "
+              f"numpy {vector_time:.3f}s, "
+              f"{loop_time / vector_time:.1f}x faster, "
+              f"totals {'match' if same else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Compare strptime with the date parser in dates.py on a column of daily
+# dates, one string at a time and as a batch
+#
+# Usage: python3 benchmarks/date_parsing.py [rows ...]
+# Defaults to 1k, 100k and 1M rows of 15 minute interval data.
+
+# os and sys libraries to import the app modules
+import os
+import sys
+
+# time library to time each parser
+import time
+
+# datetime library for strptime and the generated dates
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dates import parse_day, day_ordinals, format_day  # noqa: E402
+
+# 15 minute readings per day
+READINGS_PER_DAY = 96
+
+
+def make_dates(count):
+    """
+    Generate the date column of count rows of 15 minute readings.
+    """
+    start = date(2015, 1, 1)
+    return [format_day(start + timedelta(days=index // READINGS_PER_DAY))
+            for index in range(count)]
+
+
+def strptime_dates(date_strs):
+    """
+    The strptime parsing used before dates.py.
+    """
+    return [datetime.strptime(date_str.strip(), "%d %b %Y").date()
+            for date_str in date_strs]
+
+
+def parsed_dates(date_strs):
+    """
+    One parse_day call per string, repeated strings hit its cache.
+    """
+    parse_day.cache_clear()
+    return [parse_day(date_str.strip()) for date_str in date_strs]
+
+
+def batch_dates(date_strs):
+    """
+    The whole column at once, as ordinals.
+    """
+    parse_day.cache_clear()
+    return day_ordinals(date_strs)
+
+
+def timed(function, date_strs):
+    """
+    Return the result of function and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(date_strs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    """
+    Time each parser at each size and check they agree.
+    """
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 100000, 1000000]
+
+    for size in sizes:
+        date_strs = make_dates(size)
+        expected, strptime_time = timed(strptime_dates, date_strs)
+        parsed, parse_time = timed(parsed_dates, date_strs)
+        ordinals, batch_time = timed(batch_dates, date_strs)
+
+        same = (parsed == expected and ordinals.tolist()
+                == [day.toordinal() for day in expected])
+
+        print(f"{size:>9} rows: strptime {strptime_time:.3f}s, "
+              f"parse_day {parse_time:.3f}s "
+              f"({strptime_time / parse_time:.1f}x), "
+              f"day_ordinals {batch_time:.3f}s "
+              f"({strptime_time / batch_time:.1f}x), "
+              f"dates {'match' if same else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# In-process stand-in for the gspread Spreadsheet and Worksheet calls
+# used by run.py, with a fixed delay per call and a count of each call
+
+# time library for the delay of each call
+import time
+
+# Counter to count the calls of each method
+from collections import Counter
+
+# a1_to_rowcol to read and write A1 ranges
+from gspread.utils import a1_to_rowcol
+
+
+class FakeSpreadsheet:
+    """
+    Spreadsheet of worksheets held in memory. Every call sleeps latency
+    seconds, like a round trip to Google Sheets, and is counted in calls.
+    """
+
+    def __init__(self, worksheets, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.updated = 0
+        self.worksheets = {name: FakeWorksheet(self, name, rows)
+                           for name, rows in worksheets.items()}
+
+    def record(self, method):
+        """
+        Count a call of method and wait for the simulated round trip.
+        """
+        self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def api_calls(self):
+        """
+        Return the number of calls made so far.
+        """
+        return sum(self.calls.values())
+
+    def worksheet(self, name):
+        self.record("worksheet")
+        return self.worksheets[name]
+
+    def get_lastUpdateTime(self):
+        self.record("get_lastUpdateTime")
+        return str(self.updated)
+
+
+class FakeWorksheet:
+    """
+    Worksheet whose rows are lists of cell strings.
+    """
+
+    def __init__(self, spreadsheet, title, rows):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = [[str(cell) for cell in row] for row in rows]
+
+    def write(self, method):
+        """
+        Count a write and change the spreadsheet last update time.
+        """
+        self.spreadsheet.record(method)
+        self.spreadsheet.updated += 1
+
+    def get_all_values(self):
+        self.spreadsheet.record("get_all_values")
+        width = max((len(row) for row in self.rows), default=0)
+        return [row + [""] * (width - len(row)) for row in self.rows]
+
+    def col_values(self, col):
+        self.spreadsheet.record("col_values")
+        values = [row[col - 1] if col <= len(row) else ""
+                  for row in self.rows]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def get(self, range_name):
+        self.spreadsheet.record("get")
+        start, end = range_name.split(":")
+        start_row, start_col = a1_to_rowcol(start)
+        end_row, end_col = a1_to_rowcol(end)
+        return [row[start_col - 1:end_col]
+                for row in self.rows[start_row - 1:end_row]]
+
+    def append_row(self, values):
+        self.write("append_row")
+        self.rows.append([str(value) for value in values])
+
+    def append_rows(self, values):
+        self.write("append_rows")
+        self.rows.extend([str(value) for value in row] for row in values)
+
+    def update(self, values, range_name):
+        self.write("update")
+        self.write_range(values, range_name)
+
+    def batch_update(self, data):
+        self.write("batch_update")
+        for item in data:
+            self.write_range(item["values"], item["range"])
+
+    def write_range(self, values, range_name):
+        """
+        Write the rows of values from the top left cell of range_name.
+        """
+        start_row, start_col = a1_to_rowcol(range_name.split(":")[0])
+        for offset, new_cells in enumerate(values):
+            while len(self.rows) < start_row + offset:
+                self.rows.append([])
+            cells = self.rows[start_row + offset - 1]
+            end_col = start_col - 1 + len(new_cells)
+            cells.extend([""] * (end_col - len(cells)))
+            cells[start_col - 1:end_col] = [str(cell) for cell in new_cells]
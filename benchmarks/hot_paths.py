@@ -0,0 +1,218 @@
+# Time the hot paths of run.py against an in-memory Google Sheets
+# stand-in with 1, 5 and 20 years of daily data, reporting API calls,
+# wall time and peak memory, and save the results as JSON
+#
+# Usage: python3 benchmarks/hot_paths.py [--years 1 5 20] [--latency 0.05]
+#                                        [--output FILE] [--compare FILE]
+
+# argparse library for the benchmark options
+import argparse
+
+# builtins and contextlib to answer prompts and hide the app output
+import builtins
+import contextlib
+
+# io library to collect the hidden output
+import io
+
+# json library to save and compare the results
+import json
+
+# os, shutil, sys and tempfile libraries to run the app in a scratch folder
+import os
+import shutil
+import sys
+import tempfile
+
+# time library to time each path
+import time
+
+# tracemalloc library to measure peak memory
+import tracemalloc
+
+# datetime library for the generated dates and the result file name
+from datetime import date, datetime, timedelta
+
+# numpy library for the generated values
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from fake_sheets import FakeSpreadsheet  # noqa: E402
+
+# const for folder the results are saved to
+RESULTS_DIR = os.path.join(APP_DIR, "benchmarks", "results")
+
+# first day of the generated daily data
+FIRST_DAY = date(2000, 1, 1)
+
+
+def make_daily_rows(years):
+    """
+    Generate a daily worksheet with years of daily data.
+    """
+    days = years * 365
+    rng = np.random.default_rng(years)
+    values = rng.uniform(0, 30, size=(days, 3)).round(3)
+    rows = [["Date", "Consumed", "Exported", "Imported"]]
+    for index in range(days):
+        day = FIRST_DAY + timedelta(days=index)
+        rows.append([f"{day.day} {day.strftime('%b %Y')}"]
+                    + [str(value) for value in values[index]])
+    return rows
+
+
+def load_app():
+    """
+    Import run.py in a scratch folder so its local files are not touched.
+    """
+    os.environ.pop("SOLAR_BROKER_SOCKET", None)
+    os.environ.pop("SOLAR_SITE", None)
+    scratch = tempfile.mkdtemp(prefix="solar-bench-")
+    shutil.copy(os.path.join(APP_DIR, "tariff.json"), scratch)
+    os.chdir(scratch)
+    import run
+
+    # Pauses shown to the user are not part of the work being measured
+    run.pause = lambda seconds: None
+    # Measure the app, not the wait for the request budget
+    run.GATEWAY.requests_per_minute = 10 ** 9
+    return run, scratch
+
+
+def reset(run, spreadsheet):
+    """
+    Start a path with empty local state, as on a fresh server.
+    """
+    run.REFRESH.wait()
+    # The benchmark hands run.py the stand-in instead of a google sheet
+    run.SHEET = spreadsheet
+    run.CACHE.worksheets.clear()
+    with run.CACHE.conn:
+        run.CACHE.conn.execute("DELETE FROM held_writes")
+    run.CACHE.invalidate()
+    run.DATE_INDEX = None
+
+
+def hot_paths(run, next_day):
+    """
+    Return the name and function of each path to time.
+    """
+    new_entry = [f"{next_day.day} {next_day.strftime('%b %Y')}",
+                 "10.5", "2.25", "1.75"]
+    return [
+        ("calculate_month", run.calculate_month),
+        ("update_monthly_worksheet", run.update_monthly_worksheet),
+        ("validate_daily_data", lambda: run.validate_daily_data(new_entry)),
+        ("display_daily_data", run.display_daily_data),
+        ("display_month_data", lambda: run.display_month_data(
+            run.CACHE.get_all_values("monthly"))),
+    ]
+
+
+def measure(run, spreadsheet, function):
+    """
+    Run function once for time and API calls and once for peak memory.
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        reset(run, spreadsheet)
+        calls_before = spreadsheet.api_calls()
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        api_calls = spreadsheet.api_calls() - calls_before
+
+        reset(run, spreadsheet)
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "api_calls": api_calls,
+        "seconds": round(seconds, 6),
+        "peak_kib": round(peak / 1024, 1)
+    }
+
+
+def compare(results, path):
+    """
+    Print the change of each result from a previous results file.
+    """
+    with open(path, encoding="utf-8") as previous_file:
+        previous = {(result["years"], result["path"]): result
+                    for result in json.load(previous_file)["results"]}
+
+    print(f"\nCompared with {path}:")
+    for result in results:
+        before = previous.get((result["years"], result["path"]))
+        if before is None:
+            continue
+        ratio = result["seconds"] / max(before["seconds"], 1e-9)
+        print(f"{result['years']:>3} years {result['path']:<25} "
+              f"time x{ratio:.2f}, API calls {before['api_calls']} -> "
+              f"{result['api_calls']}, peak {before['peak_kib']} -> "
+              f"{result['peak_kib']} KiB")
+
+
+def main():
+    """
+    Time every path at each history size and save the results.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds each Google Sheets call takes")
+    parser.add_argument("--output", help="results file, default "
+                        "benchmarks/results/hot_paths-<time>.json")
+    parser.add_argument("--compare", help="previous results file")
+    options = parser.parse_args()
+
+    run, scratch = load_app()
+    answers = builtins.input
+    # Every prompt of the display paths goes back to the main menu
+    builtins.input = lambda prompt="": "1"
+
+    results = []
+    try:
+        for years in options.years:
+            daily_rows = make_daily_rows(years)
+            spreadsheet = FakeSpreadsheet({
+                "daily": daily_rows,
+                "monthly": [["Month Year", "Consumed", "Exported",
+                             "Imported", "Savings"]],
+                "payback": [["Payback"]]
+            }, options.latency)
+            next_day = FIRST_DAY + timedelta(days=len(daily_rows) - 1)
+
+            for name, function in hot_paths(run, next_day):
+                result = {"years": years, "rows": len(daily_rows) - 1,
+                          "path": name}
+                result.update(measure(run, spreadsheet, function))
+                results.append(result)
+                print(f"{years:>3} years {name:<25} "
+                      f"{result['seconds']:>9.4f}s "
+                      f"{result['api_calls']:>4} API calls "
+                      f"{result['peak_kib']:>10.1f} KiB peak")
+    finally:
+        builtins.input = answers
+        os.chdir(APP_DIR)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output = options.output or os.path.join(
+        RESULTS_DIR, f"hot_paths-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as output_file:
+        json.dump({"created": datetime.now().isoformat(timespec="seconds"),
+                   "latency": options.latency, "results": results},
+                  output_file, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if options.compare:
+        compare(results, options.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+// Time-to-first-prompt for concurrent terminal connections, comparing a
+// cold python3 run.py per connection with claiming from the worker pool.
+//
+// Usage: node benchmarks/load_test.js [connections ...]
+// Defaults to 1, 10 and 50 concurrent connections.
+
+const path = require('path');
+
+const APP_DIR = path.join(__dirname, '..');
+const PROMPT = 'Main Menu';
+
+// Measure start up only, the opening screen delay is the same for both
+process.env.SOLAR_SPLASH_SECONDS = '0';
+process.env.PWD = APP_DIR;
+
+const Pty = require('node-pty');
+
+function waitForPrompt(start, attach) {
+    return new Promise(function (resolve) {
+        var output = '';
+        var tty = attach(function (data) {
+            output += data;
+            if (output.indexOf(PROMPT) !== -1) {
+                output = '';
+                resolve(Date.now() - start);
+                tty.kill(9);
+            }
+        });
+    });
+}
+
+function cold(count) {
+    var start = Date.now();
+    var sessions = [];
+    for (var i = 0; i < count; i++) {
+        sessions.push(waitForPrompt(start, function (onData) {
+            var tty = Pty.spawn('python3', ['run.py'], {
+                name: 'xterm-color',
+                cols: 80,
+                rows: 24,
+                cwd: APP_DIR,
+                env: process.env
+            });
+            tty.on('data', onData);
+            return tty;
+        }));
+    }
+    return Promise.all(sessions);
+}
+
+function pooled(Pool, count) {
+    var start = Date.now();
+    var sessions = [];
+    for (var i = 0; i < count; i++) {
+        sessions.push(waitForPrompt(start, function (onData) {
+            return Pool.claim(onData, function () {});
+        }));
+    }
+    return Promise.all(sessions);
+}
+
+function waitForPool(count) {
+    // Give the pool time to warm up before connections arrive
+    return new Promise(function (resolve) {
+        setTimeout(resolve, 3000 + count * 100);
+    });
+}
+
+function summary(label, count, times) {
+    times.sort(function (a, b) {
+        return a - b;
+    });
+    var median = times[Math.floor(times.length / 2)];
+    var worst = times[times.length - 1];
+    console.log(label + ' ' + count + ' connections: median ' + median + 'ms, worst ' + worst + 'ms');
+}
+
+async function main() {
+    var counts = process.argv.slice(2).map(Number);
+    if (!counts.length)
+        counts = [1, 10, 50];
+
+    var largest = Math.max.apply(null, counts);
+    process.env.WORKER_POOL_SIZE = String(largest);
+    const Pool = require('../worker_pool');
+    Pool.start();
+
+    for (var count of counts) {
+        summary('cold  ', count, await cold(count));
+        await waitForPool(largest);
+        summary('pooled', count, await pooled(Pool, count));
+    }
+
+    process.exit(0);
+}
+
+main();
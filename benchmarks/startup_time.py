@@ -0,0 +1,61 @@
+# Measure how long run.py takes to show the main menu
+#
+# Usage: python3 benchmarks/startup_time.py [runs]
+
+# os library for the app directory and environment
+import os
+
+# subprocess library to start run.py
+import subprocess
+
+# sys library to read the number of runs
+import sys
+
+# time library to time each start
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# how each start is configured: (label, extra arguments, splash seconds)
+SCENARIOS = [
+    ("default splash", [], "6"),
+    ("no splash", ["--no-splash"], "0")
+    ]
+
+
+def time_to_menu(args, splash_seconds):
+    """
+    Start run.py and return the seconds until the main menu is printed.
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED="1", TERM="dumb",
+               SOLAR_SPLASH_SECONDS=splash_seconds)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "run.py"] + args, cwd=APP_DIR, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, text=True)
+    try:
+        for line in process.stdout:
+            if "Main Menu" in line:
+                return time.perf_counter() - start
+    finally:
+        process.kill()
+        process.wait()
+    raise RuntimeError("run.py exited before showing the main menu")
+
+
+def main():
+    """
+    Time each start scenario and print the results.
+    """
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    for label, args, splash_seconds in SCENARIOS:
+        times = sorted(time_to_menu(args, splash_seconds)
+                       for _ in range(runs))
+        print(f"{label:>15}: median {times[len(times) // 2]:.3f}s, "
+              f"best {times[0]:.3f}s over {runs} runs")
+
+
+if __name__ == "__main__":
+    main()
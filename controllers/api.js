@@ -0,0 +1,283 @@
+const crypto = require('crypto');
+const ChildProcess = require('child_process');
+
+// JSON API for dashboards. Each dataset is read with
+// python3 run.py --json show daily|monthly|payback and kept in memory, so
+// polls are answered without starting python or calling Google Sheets.
+// A dataset older than API_REFRESH_MS is still served while a single
+// refresh runs in the background for every request.
+
+const REFRESH_MS = parseInt(process.env.API_REFRESH_MS || '60000');
+
+// Exit codes of the run.py commands
+const EXIT_OK = 0;
+const EXIT_INVALID = 1;
+const EXIT_SHEETS = 3;
+
+const MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'];
+const DAY_MS = 86400000;
+
+// Loaded datasets by site and name
+var datasets = {};
+
+// Daily entries are added one request at a time so duplicate dates are
+// caught by validation instead of racing each other
+var writes = Promise.resolve();
+
+exports.install = function () {
+
+    ROUTE('GET /api/daily/', function () {
+        read(this, 'daily');
+    });
+
+    ROUTE('GET /api/monthly/', function () {
+        read(this, 'monthly');
+    });
+
+    ROUTE('GET /api/payback/', function () {
+        read(this, 'payback');
+    });
+
+    ROUTE('POST /api/daily/', addDaily);
+
+};
+
+// Run python3 run.py --json with args, passing input on stdin. callback
+// receives an error if python could not start, else the exit code and
+// the parsed JSON result.
+function runCommand(args, input, callback) {
+
+    var child = ChildProcess.spawn('python3', ['run.py', '--json'].concat(args), {
+        cwd: process.env.PWD,
+        env: process.env
+    });
+    var stdout = '';
+    var done = false;
+
+    child.stdout.on('data', function (data) {
+        stdout += data;
+    });
+
+    // Progress messages and errors go to the server log
+    child.stderr.on('data', function (data) {
+        process.stderr.write(data);
+    });
+
+    child.on('error', function (err) {
+        if (!done) {
+            done = true;
+            callback(err);
+        }
+    });
+
+    child.on('close', function (code) {
+        if (done)
+            return;
+        done = true;
+        var result = null;
+        try {
+            result = JSON.parse(stdout);
+        } catch (e) {
+            // Leave result null, e.g. when run.py failed to start
+        }
+        callback(null, code, result);
+    });
+
+    child.stdin.end(input || '');
+}
+
+// Day number of a Day Month Year date (e.g. 3 Jun 2024), or of the first
+// day of a Month Year (e.g. Jun 2024). NaN if it is not a date.
+function dayNumber(value) {
+
+    var parts = String(value).trim().split(/\s+/);
+    if (parts.length === 2)
+        parts.unshift('1');
+    if (parts.length !== 3 || !/^\d{1,2}$/.test(parts[0]) || !/^\d{4}$/.test(parts[2]))
+        return NaN;
+
+    var month = MONTHS.indexOf(parts[1].toLowerCase());
+    var day = parseInt(parts[0]);
+    var time = Date.UTC(parseInt(parts[2]), month, day);
+    // Reject an unknown month or a day past the end of the month
+    if (month === -1 || new Date(time).getUTCDate() !== day)
+        return NaN;
+    return time / DAY_MS;
+}
+
+// Days in the month of day number day
+function monthDays(day) {
+    var date = new Date(day * DAY_MS);
+    return new Date(Date.UTC(date.getUTCFullYear(), date.getUTCMonth() + 1, 0)).getUTCDate();
+}
+
+function hash(text) {
+    return crypto.createHash('sha1').update(text).digest('hex');
+}
+
+function send(controller, status, body, headers) {
+    controller.status = status;
+    controller.content(body === undefined ? '' : JSON.stringify(body), 'application/json', headers || {});
+}
+
+// Return the site arguments for run.py, or null for an invalid name
+function siteArgs(site) {
+    if (site === undefined || site === '')
+        return [];
+    return /^[\w-]+$/.test(site) ? ['--site', site] : null;
+}
+
+// Read the dataset from run.py, calling back every request waiting for it
+function refresh(entry) {
+
+    if (entry.waiting)
+        return;
+    entry.waiting = [];
+    entry.checkedAt = Date.now();
+
+    runCommand(entry.args.concat(['show', entry.name]), '', function (err, code, result) {
+
+        // A pending journal is reported with exit code 3 but the data is current
+        if (!err && result && !result.error && (code === EXIT_OK || code === EXIT_SHEETS)) {
+            entry.data = result;
+            entry.version = hash(JSON.stringify(result));
+            // Day number of each row for date range queries
+            entry.days = (result.rows || []).map(function (row) {
+                return dayNumber(row.date || row.month_year);
+            });
+        } else if (!err) {
+            err = new Error(result && result.error ? result.error : 'run.py exited with code ' + code);
+        }
+
+        var waiting = entry.waiting;
+        entry.waiting = null;
+        waiting.forEach(function (callback) {
+            callback(entry.data ? null : err, entry);
+        });
+    });
+}
+
+function load(site, name, callback) {
+
+    var args = siteArgs(site);
+    var key = args.join(' ') + ' ' + name;
+    var entry = datasets[key];
+    if (!entry)
+        entry = datasets[key] = { args: args, name: name, data: null, checkedAt: 0, waiting: null };
+
+    // Serve the data already loaded, even while it is being refreshed
+    if (entry.data) {
+        if (Date.now() - entry.checkedAt >= REFRESH_MS)
+            refresh(entry);
+        return callback(null, entry);
+    }
+
+    // Nothing loaded yet, or the last load failed
+    refresh(entry);
+    entry.waiting.push(callback);
+}
+
+// Reload the datasets of a site after new daily data
+function invalidate(site) {
+    var prefix = siteArgs(site).join(' ') + ' ';
+    Object.keys(datasets).forEach(function (key) {
+        if (key.indexOf(prefix) === 0) {
+            datasets[key].checkedAt = 0;
+            refresh(datasets[key]);
+        }
+    });
+}
+
+// GET /api/daily, /api/monthly or /api/payback with optional site, and
+// from and to dates (e.g. ?from=1 Jun 2024&to=30 Jun 2024). The response
+// has an ETag, a request with a matching If-None-Match gets a 304.
+function read(controller, name) {
+
+    var query = controller.query;
+    if (!siteArgs(query.site))
+        return send(controller, 400, { error: 'Invalid site' });
+
+    var from = query.from ? dayNumber(query.from) : -Infinity;
+    var to = query.to ? dayNumber(query.to) : Infinity;
+    if (isNaN(from) || isNaN(to))
+        return send(controller, 400, { error: 'Invalid date, use e.g. 3 Jun 2024' });
+    // A Month Year ends on the last day of the month
+    if (query.to && String(query.to).trim().split(/\s+/).length === 2)
+        to += monthDays(to) - 1;
+    // Months are kept when they start inside the range, from any day of it
+    if (name === 'monthly' && query.from)
+        from -= new Date(from * DAY_MS).getUTCDate() - 1;
+
+    load(query.site, name, function (err, entry) {
+
+        if (err)
+            return send(controller, 503, { error: err.message });
+
+        var etag = '"' + hash(entry.version + ' ' + from + ' ' + to) + '"';
+        var headers = { 'ETag': etag, 'Cache-Control': 'no-cache' };
+        var match = controller.req.headers['if-none-match'];
+        if (match && match.split(',').some(function (tag) {
+            return tag.trim().replace(/^W\//, '') === etag;
+        }))
+            return send(controller, 304, undefined, headers);
+
+        var body = entry.data;
+        if (body.rows && (query.from || query.to)) {
+            body = Object.assign({}, body, {
+                rows: body.rows.filter(function (row, index) {
+                    return entry.days[index] >= from && entry.days[index] <= to;
+                })
+            });
+        }
+        send(controller, 200, body, headers);
+    });
+}
+
+// POST /api/daily with { "entries": ["3 Jun 2024, 5.154, 20.698, 6.354"] }
+// or one or a list of { "date", "consumed", "exported", "imported" }.
+// The entries are checked by run.py add like typed daily data: 201 when
+// they are saved, 400 with the errors if any is invalid (none are saved)
+// and 202 when they are saved locally but Google Sheets is unreachable.
+function addDaily() {
+
+    var controller = this;
+    var body = controller.body || {};
+    var site = controller.query.site;
+    var args = siteArgs(site);
+    if (!args)
+        return send(controller, 400, { error: 'Invalid site' });
+
+    var entries = Array.isArray(body) ? body : body.entries;
+    if (!Array.isArray(entries))
+        entries = body.date ? [body] : [];
+    entries = entries.map(function (entry) {
+        if (typeof entry === 'object' && entry !== null)
+            return [entry.date, entry.consumed, entry.exported, entry.imported].join(', ');
+        return String(entry);
+    });
+
+    if (!entries.length)
+        return send(controller, 400, { error: 'No daily entries given' });
+    // Each entry is one line on the stdin of run.py add
+    if (entries.some(function (entry) { return /[\r\n]/.test(entry); }))
+        return send(controller, 400, { error: 'Entries cannot contain line breaks' });
+
+    writes = writes.then(function () {
+        return new Promise(function (resolve) {
+            runCommand(args.concat(['add', '-']), entries.join('\n') + '\n', function (err, code, result) {
+                resolve();
+                if (err || !result)
+                    return send(controller, 500, { error: err ? err.message : 'run.py exited with code ' + code });
+                if (code === EXIT_INVALID)
+                    return send(controller, 400, result);
+                // Google Sheets could not be reached to check the entries
+                if (code === EXIT_SHEETS && result.error)
+                    return send(controller, 503, result);
+                if (code !== EXIT_OK && code !== EXIT_SHEETS)
+                    return send(controller, 500, result);
+                invalidate(site);
+                send(controller, code === EXIT_OK ? 201 : 202, result);
+            });
+        });
+    });
+}
@@ -1,54 +1,174 @@
-const Pty = require('node-pty');
 const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const ChildProcess = require('child_process');
+const Pool = require('../worker_pool');
+
+// Set SHEETS_BROKER=0 to let each python process connect on its own
+const BROKER_ENABLED = process.env.SHEETS_BROKER !== '0';
+const BROKER_RESTART_MS = 1000;
+
+// Terminal output is sent in frames of up to FRAME_BYTES, collected for
+// at most FRAME_MS, instead of one websocket frame per pty chunk
+const FRAME_MS = 15;
+const FRAME_BYTES = 16384;
+
+// The pty is paused while more than SOCKET_HIGH_WATER bytes wait to be
+// sent to a slow client, and resumed once they are sent
+const SOCKET_HIGH_WATER = 262144;
+
+// Sessions without input for SESSION_IDLE_MS are closed (0 never)
+const SESSION_IDLE_MS = parseInt(process.env.SESSION_IDLE_MS || '900000');
+const IDLE_CHECK_MS = 30000;
+
+// At most MAX_SESSIONS terminals run at once, later visitors wait in turn
+const MAX_SESSIONS = parseInt(process.env.MAX_SESSIONS || '20');
+
+var sessions = [];
+var waiting = [];
+var idleChecker = null;
 
 exports.install = function () {
 
     ROUTE('/');
     WEBSOCKET('/', socket, ['raw']);
 
+    // Share one Google Sheets session between all python processes
+    if (BROKER_ENABLED) {
+        process.env.SOLAR_BROKER_SOCKET = path.join(os.tmpdir(), 'solar_broker.sock');
+        startBroker();
+    }
+
+    // Start warm python workers for new connections
+    Pool.start();
+
+    if (!idleChecker && SESSION_IDLE_MS > 0)
+        idleChecker = setInterval(closeIdleSessions, Math.min(IDLE_CHECK_MS, SESSION_IDLE_MS));
+
 };
 
+function startBroker() {
+
+    var broker = ChildProcess.spawn('python3', ['sheets_broker.py'], {
+        cwd: process.env.PWD,
+        env: process.env,
+        stdio: 'inherit'
+    });
+
+    // run.py connects directly while the broker is down
+    broker.on('exit', function (code, signal) {
+        console.log("Sheets broker stopped, restarting");
+        setTimeout(startBroker, BROKER_RESTART_MS);
+    });
+}
+
 function socket() {
 
     this.encodedecode = false;
     this.autodestroy();
 
     this.on('open', function (client) {
+        client.output = '';
+        client.flushTimer = null;
+        client.lastInput = Date.now();
 
-        // Spawn terminal
-        client.tty = Pty.spawn('python3', ['run.py'], {
-            name: 'xterm-color',
-            cols: 80,
-            rows: 24,
-            cwd: process.env.PWD,
-            env: process.env
-        });
-
-        client.tty.on('exit', function (code, signal) {
-            client.tty = null;
-            client.close();
-            console.log("Process killed");
-        });
-
-        client.tty.on('data', function (data) {
-            client.send(data);
-        });
-
+        if (sessions.length < MAX_SESSIONS) {
+            startSession(client);
+        } else {
+            waiting.push(client);
+            client.send('All terminals are in use, you are number ' + waiting.length + ' in the queue. The program starts as soon as a terminal is free.\r\n');
+        }
     });
 
     this.on('close', function (client) {
+        var index = waiting.indexOf(client);
+        if (index !== -1)
+            waiting.splice(index, 1);
+        clearTimeout(client.flushTimer);
         if (client.tty) {
             client.tty.kill(9);
             client.tty = null;
             console.log("Process killed and terminal unloaded");
         }
+        endSession(client);
     });
 
     this.on('message', function (client, msg) {
+        client.lastInput = Date.now();
         client.tty && client.tty.write(msg);
     });
 }
 
+function startSession(client) {
+
+    sessions.push(client);
+    client.lastInput = Date.now();
+
+    // Claim a warm terminal from the worker pool
+    client.tty = Pool.claim(function (data) {
+        queueOutput(client, data);
+    }, function (code, signal) {
+        client.tty = null;
+        flushOutput(client);
+        client.close();
+        endSession(client);
+        console.log("Process killed");
+    });
+}
+
+function endSession(client) {
+
+    var index = sessions.indexOf(client);
+    if (index === -1)
+        return;
+    sessions.splice(index, 1);
+
+    // Hand the free terminal to the next visitor in the queue
+    if (waiting.length)
+        startSession(waiting.shift());
+}
+
+function queueOutput(client, data) {
+    client.output += data;
+    if (client.output.length >= FRAME_BYTES)
+        flushOutput(client);
+    else if (!client.flushTimer)
+        client.flushTimer = setTimeout(flushOutput, FRAME_MS, client);
+}
+
+function flushOutput(client) {
+
+    clearTimeout(client.flushTimer);
+    client.flushTimer = null;
+    if (!client.output)
+        return;
+    client.send(client.output);
+    client.output = '';
+
+    // Stop reading the program's output until a slow client catches up
+    var socket = client.socket;
+    if (client.tty && !client.paused && socket && socket.writableLength > SOCKET_HIGH_WATER) {
+        var tty = client.tty;
+        client.paused = true;
+        tty.pause();
+        socket.once('drain', function () {
+            client.paused = false;
+            tty.resume();
+        });
+    }
+}
+
+function closeIdleSessions() {
+    var now = Date.now();
+    sessions.slice().forEach(function (client) {
+        if (now - client.lastInput > SESSION_IDLE_MS) {
+            flushOutput(client);
+            client.send('\r\n\r\nSession closed after ' + Math.round(SESSION_IDLE_MS / 60000) + ' minutes without input. Press Run Program to start again.\r\n');
+            client.close();
+        }
+    });
+}
+
 if (process.env.CREDS != null) {
     console.log("Creating creds.json file.");
     fs.writeFile('creds.json', process.env.CREDS, 'utf8', function (err) {
@@ -0,0 +1,140 @@
+# Reader for bulk daily data files, either rows in the same format as the
+# typed input or the daily CSV exports of common inverter portals
+
+# csv library to read the import file
+import csv
+
+# datetime library to convert export date formats
+from datetime import date, datetime
+
+# fast parsing and formatting of the worksheet dates
+from dates import parse_day, format_day
+
+# date formats found in inverter exports, tried in order
+DATE_FORMATS = [
+    "%d %b %Y",
+    "%d %B %Y",
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%d.%m.%Y",
+    "%Y/%m/%d",
+    "%d-%m-%Y"
+    ]
+
+# header names used by inverter exports for each daily value
+COLUMN_ALIASES = {
+    "date": ["date", "day", "time", "timestamp"],
+    "consumed": ["consumed", "consumption", "load"],
+    "exported": ["export", "feed-in", "feed in", "feedin", "to grid"],
+    "imported": ["import", "purchased", "from grid", "grid consumption"]
+}
+
+
+def find_columns(header):
+    """
+    Find the column index and unit scale of each daily value in header.
+    Returns None if the header does not name all four values.
+    """
+    columns = {}
+    names = [name.strip().lower() for name in header]
+
+    # Check the grid columns first, "grid consumption" is an import
+    for field in ["date", "imported", "exported", "consumed"]:
+        for index, name in enumerate(names):
+            taken = [column[0] for column in columns.values()]
+            if index in taken:
+                continue
+            if any(alias in name for alias in COLUMN_ALIASES[field]):
+                # Values in Wh are converted to kW(h)
+                scale = 0.001 if "(wh)" in name or "[wh]" in name else 1
+                columns[field] = (index, scale)
+                break
+
+    if len(columns) != 4:
+        return None
+    return columns
+
+
+def normalize_date(date_str):
+    """
+    Convert an export date to the Day Month Year format.
+    Dates in an unknown format are returned unchanged for validation.
+    """
+    # Drop a time of day, e.g. 2024-06-03 00:00:00 or 2024-06-03T00:00
+    parts = [part for part in date_str.split() if ":" not in part]
+    date_part = " ".join(parts).split("T")[0]
+
+    # Fast paths for the typed format and ISO dates, the most common
+    try:
+        return format_day(parse_day(date_part))
+    except ValueError:
+        pass
+    if len(date_part) == 10 and date_part[4] == "-":
+        try:
+            return format_day(date.fromisoformat(date_part))
+        except ValueError:
+            pass
+
+    for date_format in DATE_FORMATS:
+        try:
+            daily_date = datetime.strptime(date_part, date_format)
+        except ValueError:
+            continue
+        return format_day(daily_date)
+    return date_str.strip()
+
+
+def convert_value(value, scale):
+    """
+    Convert an export value to kW(h), left unchanged if not a number.
+    """
+    try:
+        number = float(value.strip().replace(",", "."))
+    except ValueError:
+        return value.strip()
+    return str(round(number * scale, 3))
+
+
+def read_daily_file(path):
+    """
+    Read a daily data file one line at a time.
+    Yields the line number, the raw fields and the four daily values.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as csv_file:
+        sample = csv_file.read(4096)
+        csv_file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+
+        reader = csv.reader(csv_file, dialect)
+        columns = None
+        first_row = True
+
+        for fields in reader:
+            if not any(field.strip() for field in fields):
+                continue
+
+            # An inverter export names its columns in the first row
+            if first_row:
+                first_row = False
+                columns = find_columns(fields)
+                if columns:
+                    continue
+
+            if columns:
+                values = []
+                for field in ["date", "consumed", "exported", "imported"]:
+                    index, scale = columns[field]
+                    value = fields[index] if index < len(fields) else ""
+                    if field == "date":
+                        values.append(normalize_date(value))
+                    else:
+                        values.append(convert_value(value, scale))
+            else:
+                # Same layout as the typed input
+                values = [field.strip() for field in fields]
+                values[0] = normalize_date(values[0])
+
+            yield reader.line_num, fields, values
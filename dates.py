@@ -0,0 +1,116 @@
+# Fast parsing and formatting of the Day Month Year dates used in the
+# worksheets (e.g. 3 Jun 2024), without strptime or the locale
+
+# date to build the parsed dates
+from datetime import date
+
+# lru_cache to parse a repeated date string once
+from functools import lru_cache
+
+# numpy library for the batch parser
+import numpy as np
+
+# month names used in the worksheets, always in English
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# month number of each lower case month name
+MONTH_NUMBERS = {name.lower(): number
+                 for number, name in enumerate(MONTH_NAMES, start=1)}
+
+# ordinal of 1 Jan 1970, day 0 of datetime64[D]
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def month_number(month_str):
+    """
+    Return the number of a month name (e.g. Jun), any case.
+    """
+    try:
+        return MONTH_NUMBERS[month_str.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown month: {month_str}") from None
+
+
+def number(value, min_digits, max_digits):
+    """
+    Convert the digits of a day or year to an int.
+    """
+    if (not value.isascii() or not value.isdigit()
+            or not min_digits <= len(value) <= max_digits):
+        raise ValueError(f"Invalid number: {value}")
+    return int(value)
+
+
+@lru_cache(maxsize=8192)
+def parse_day(date_str):
+    """
+    Parse a Day Month Year date (e.g. 3 Jun 2024) to a date.
+    Raises ValueError like strptime(date_str, "%d %b %Y").
+    """
+    parts = date_str.split()
+    if len(parts) != 3:
+        raise ValueError(f"Invalid date: {date_str}")
+    day, month, year = parts
+    return date(number(year, 4, 4), month_number(month), number(day, 1, 2))
+
+
+@lru_cache(maxsize=1024)
+def parse_month(month_str):
+    """
+    Parse a Month Year (e.g. Jun 2024) to the first day of the month.
+    """
+    parts = month_str.split()
+    if len(parts) != 2:
+        raise ValueError(f"Invalid month: {month_str}")
+    month, year = parts
+    return date(number(year, 4, 4), month_number(month), 1)
+
+
+def parse_date(date_str):
+    """
+    Parse a Day Month Year date, or a Month Year taken as its first day.
+    """
+    if len(date_str.split()) == 2:
+        return parse_month(date_str)
+    return parse_day(date_str)
+
+
+def day_ordinals(date_strs):
+    """
+    Parse a column of Day Month Year dates to date ordinals (as from
+    date.toordinal) in one pass. Each distinct string is parsed once and
+    strings that are not valid dates give 0.
+    """
+    codes = {}
+    index = np.fromiter(
+        (codes.setdefault(date_str, len(codes)) for date_str in date_strs),
+        np.int64)
+    ordinals = np.zeros(len(codes), np.int64)
+    for code, date_str in enumerate(codes):
+        try:
+            ordinals[code] = parse_date(date_str.strip()).toordinal()
+        except ValueError:
+            pass
+    return ordinals[index]
+
+
+def to_datetime64(ordinals):
+    """
+    Convert date ordinals to datetime64[D] values.
+    """
+    return (np.asarray(ordinals) - EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+def format_day(day):
+    """
+    Format a date as Day Month Year (e.g. 3 Jun 2024).
+    """
+    return f"{day.day} {MONTH_NAMES[day.month - 1]} {day.year}"
+
+
+def format_month(day):
+    """
+    Format the month of a date as Month Year (e.g. Jun 2024).
+    """
+    return f"{MONTH_NAMES[day.month - 1]} {day.year}"
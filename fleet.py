@@ -0,0 +1,123 @@
+# Monthly rollups of every site kept in one SQLite file, for a fleet
+# summary that does not open each site's google sheet
+
+# sqlite3 library for the rollup file
+import sqlite3
+
+# threading library to share the store with the refresh worker
+import threading
+
+# numpy library for the combined daily data of every site
+import numpy as np
+
+# grouped sums by site and month
+from aggregate import load_daily_arrays, site_group_totals
+
+# month label of the rollups
+from dates import format_month
+
+# const for untracked fleet rollup file
+FLEET_FILE = "solar_fleet.sqlite3"
+
+
+class FleetStore:
+    """
+    Monthly totals and project cost of each site. A site's months are
+    saved whenever its monthly sheet changes, and can be rebuilt for
+    every site at once from their daily data.
+    """
+
+    def __init__(self, path=FLEET_FILE):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10,
+                                    check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS site_months (
+                site TEXT NOT NULL,
+                month TEXT NOT NULL,
+                consumed REAL NOT NULL,
+                exported REAL NOT NULL,
+                imported REAL NOT NULL,
+                savings REAL NOT NULL,
+                PRIMARY KEY (site, month)
+            );
+            CREATE TABLE IF NOT EXISTS site_costs (
+                site TEXT PRIMARY KEY,
+                project_cost REAL NOT NULL
+            );
+        """)
+
+    def save_site_months(self, site, month_rows):
+        """
+        Replace the months of site with the rows of its monthly sheet.
+        """
+        rows = []
+        for row in month_rows:
+            if not row or not row[0].strip():
+                continue
+            values = [float(value or 0) for value in row[1:5]]
+            rows.append((site, row[0].strip(), *values))
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM site_months WHERE site = ?", (site,))
+            self.conn.executemany(
+                "INSERT INTO site_months (site, month, consumed, exported, "
+                "imported, savings) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def set_project_cost(self, site, project_cost):
+        """
+        Store the project cost of site.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO site_costs (site, project_cost) "
+                "VALUES (?, ?)", (site, project_cost))
+
+    def rebuild(self, tariff, daily_rows_by_site):
+        """
+        Recalculate the months of every site from its daily sheet rows,
+        in one grouped pass over the daily data of all the sites.
+        """
+        names = list(daily_rows_by_site)
+        all_rows = []
+        codes = []
+        for code, name in enumerate(names):
+            all_rows.extend(daily_rows_by_site[name])
+            codes.append(np.full(len(daily_rows_by_site[name]), code))
+
+        dates, energy = load_daily_arrays(all_rows)
+        sites = np.concatenate(codes) if codes else np.zeros(0, int)
+        savings = tariff.savings(
+            dates, energy[:, 0], energy[:, 1], energy[:, 2])
+        values = np.column_stack([energy, savings])
+
+        site_codes, months, totals, counts = site_group_totals(
+            sites, dates, values, "M")
+
+        rows = [(names[code], format_month(month), *map(float, total))
+                for code, month, total in zip(
+                    site_codes, months.astype(object), totals)]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM site_months WHERE site = ?",
+                [(name,) for name in names])
+            self.conn.executemany(
+                "INSERT INTO site_months (site, month, consumed, exported, "
+                "imported, savings) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def summary(self):
+        """
+        Return the months, energy totals, savings and payback of each
+        site, ordered by site. Payback is None without a project cost.
+        """
+        with self.lock:
+            return self.conn.execute("""
+                SELECT site_months.site, COUNT(*), SUM(consumed),
+                       SUM(exported), SUM(imported), SUM(savings),
+                       SUM(savings) - site_costs.project_cost
+                FROM site_months
+                LEFT JOIN site_costs ON site_costs.site = site_months.site
+                GROUP BY site_months.site
+                ORDER BY site_months.site
+            """).fetchall()
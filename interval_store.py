@@ -0,0 +1,267 @@
+# Columnar store of smart meter interval readings (e.g. every
+# 30 minutes), rolled up into the daily and monthly views
+
+# csv library to stream the readings file
+import csv
+
+# os library for the column files
+import os
+
+# numpy library for the memory-mapped columns
+import numpy as np
+
+# aggregation of the readings by day and month
+from aggregate import group_totals
+
+# header names shared with the daily data import
+from daily_import import find_columns, convert_value
+
+# const for untracked interval data directory
+STORE_DIR = "interval_data"
+
+# column files of the store and the type of their values
+COLUMNS = [
+    ("timestamp", np.dtype("<i8")),
+    ("consumed", np.dtype("<f8")),
+    ("exported", np.dtype("<f8")),
+    ("imported", np.dtype("<f8"))
+    ]
+
+# fields of each reading, in the column order of the daily data
+FIELDS = ["date", "consumed", "exported", "imported"]
+
+# readings checked for times of day before a file is taken as daily data
+INTERVAL_SAMPLE_ROWS = 100
+
+# readings appended to the store at a time while ingesting a file
+CHUNK_READINGS = 10000
+
+
+class IntervalStore:
+    """
+    Interval readings kept as one binary file per column, in time order,
+    and read back memory-mapped. New readings are appended, readings
+    before the latest one are merged in by rewriting the columns.
+    """
+
+    def __init__(self, path=STORE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.repair()
+
+    def column_path(self, name):
+        """
+        Return the file path of column name.
+        """
+        return os.path.join(self.path, f"{name}.bin")
+
+    def __len__(self):
+        """
+        Return the number of complete readings in the store.
+        """
+        return min(os.path.getsize(self.column_path(name)) // dtype.itemsize
+                   if os.path.exists(self.column_path(name)) else 0
+                   for name, dtype in COLUMNS)
+
+    def repair(self):
+        """
+        Cut every column to the same length after an interrupted append.
+        """
+        length = len(self)
+        for name, dtype in COLUMNS:
+            with open(self.column_path(name), "ab") as column_file:
+                column_file.truncate(length * dtype.itemsize)
+
+    def columns(self):
+        """
+        Return each column as a read-only memory-mapped array.
+        """
+        length = len(self)
+        arrays = {}
+        for name, dtype in COLUMNS:
+            if length:
+                arrays[name] = np.memmap(self.column_path(name), dtype=dtype,
+                                         mode="r", shape=(length,))
+            else:
+                arrays[name] = np.zeros(0, dtype=dtype)
+        return arrays
+
+    def last_timestamp(self):
+        """
+        Return the time of the latest reading in seconds, or None.
+        """
+        timestamps = self.columns()["timestamp"]
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def append(self, timestamps, energy):
+        """
+        Add readings to the store in time order. timestamps are datetime64
+        values and energy has a consumed, exported and imported column.
+        Readings after the latest stored reading are appended, earlier
+        readings (e.g. a late meter export filling a gap) are merged in
+        order. A reading at a time already stored is skipped.
+        Returns the number added.
+        """
+        seconds = timestamps.astype("datetime64[s]").astype(np.int64)
+
+        # Keep the first reading of each time, in time order
+        seconds, first = np.unique(seconds, return_index=True)
+        energy = energy[first]
+
+        last = self.last_timestamp()
+        if last is None or not len(seconds) or seconds[0] > last:
+            values = [seconds] + [energy[:, index] for index in range(3)]
+            for (name, dtype), column in zip(COLUMNS, values):
+                with open(self.column_path(name), "ab") as column_file:
+                    column.astype(dtype).tofile(column_file)
+                    column_file.flush()
+                    os.fsync(column_file.fileno())
+            return len(seconds)
+
+        # Readings from the earliest new time on are merged and rewritten
+        stored = self.columns()
+        start = int(np.searchsorted(stored["timestamp"], seconds[0]))
+        tail = stored["timestamp"][start:]
+        new = ~np.isin(seconds, tail)
+        if not new.any():
+            return 0
+        merged_seconds = np.concatenate([tail, seconds[new]])
+        order = np.argsort(merged_seconds, kind="stable")
+        merged = [merged_seconds[order]] + [
+            np.concatenate([stored[name][start:], energy[new, index]])[order]
+            for index, (name, dtype) in enumerate(COLUMNS[1:])]
+
+        # Every column is written in full before any old file is replaced,
+        # so a merge interrupted while writing leaves the store as it was
+        for (name, dtype), column in zip(COLUMNS, merged):
+            path = self.column_path(name)
+            with open(path + ".tmp", "wb") as column_file:
+                stored[name][:start].tofile(column_file)
+                column.astype(dtype).tofile(column_file)
+                column_file.flush()
+                os.fsync(column_file.fileno())
+        for name, dtype in COLUMNS:
+            path = self.column_path(name)
+            os.replace(path + ".tmp", path)
+
+        return int(new.sum())
+
+    def ingest(self, path):
+        """
+        Stream a readings file into the store in chunks.
+        Returns the number of readings appended and skipped.
+        """
+        appended = 0
+        skipped = 0
+        for timestamps, energy, rejected in read_interval_file(path):
+            count = self.append(timestamps, energy)
+            appended += count
+            skipped += rejected + len(timestamps) - count
+        return appended, skipped
+
+    def rollup(self, period="D"):
+        """
+        Return the day ("D") or month ("M") keys of the stored readings
+        with their consumed, exported and imported totals.
+        """
+        columns = self.columns()
+        dates = columns["timestamp"].astype("datetime64[s]").astype(
+            "datetime64[D]")
+        energy = np.column_stack([columns["consumed"], columns["exported"],
+                                  columns["imported"]])
+        keys, totals, counts = group_totals(dates, energy, period)
+        return keys, totals
+
+
+def is_interval_file(path):
+    """
+    Check if a file holds readings taken during the day, a timestamp at
+    a time other than midnight within its first INTERVAL_SAMPLE_ROWS
+    days. Daily exports with midnight timestamps (e.g. 2024-06-03
+    00:00:00) are daily data.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as csv_file:
+        reader = csv.reader(csv_file)
+        date_index = 0
+        days = set()
+        for fields in reader:
+            if not any(field.strip() for field in fields):
+                continue
+
+            if reader.line_num == 1:
+                columns = find_columns(fields)
+                if columns:
+                    date_index = columns["date"][0]
+                    continue
+
+            value = fields[date_index] if date_index < len(fields) else ""
+            if ":" not in value:
+                return False
+            try:
+                timestamp = np.datetime64(value.strip(), "s")
+            except ValueError:
+                return False
+            day = timestamp.astype("datetime64[D]")
+            if timestamp != day:
+                return True
+            # A repeated midnight line is a duplicate day, not a reading
+            if day in days:
+                continue
+            days.add(day)
+            if len(days) == INTERVAL_SAMPLE_ROWS:
+                break
+    return False
+
+
+def read_interval_file(path):
+    """
+    Read a readings file of ISO timestamps (e.g. 2024-06-03T00:30) with
+    consumed, exported and imported values, CHUNK_READINGS at a time.
+    Yields the timestamps, the energy values and the rejected line count.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as csv_file:
+        reader = csv.reader(csv_file)
+        columns = None
+        timestamps = []
+        energy = []
+        rejected = 0
+
+        for fields in reader:
+            if not any(field.strip() for field in fields):
+                continue
+
+            if reader.line_num == 1:
+                columns = find_columns(fields)
+                if columns:
+                    continue
+
+            if columns:
+                row = {}
+                for name, (index, scale) in columns.items():
+                    value = fields[index] if index < len(fields) else ""
+                    row[name] = (value, scale)
+            else:
+                # Same column order as the daily data
+                row = {name: (value, 1)
+                       for name, value in zip(FIELDS, fields)}
+
+            try:
+                timestamp = np.datetime64(row["date"][0].strip(), "s")
+                reading = [float(convert_value(*row[name]))
+                           for name in FIELDS[1:]]
+            except (KeyError, ValueError):
+                rejected += 1
+                continue
+
+            timestamps.append(timestamp)
+            energy.append(reading)
+
+            if len(timestamps) == CHUNK_READINGS:
+                yield np.array(timestamps), np.array(energy), rejected
+                timestamps = []
+                energy = []
+                rejected = 0
+
+        if timestamps or rejected:
+            yield (np.array(timestamps, dtype="datetime64[s]"),
+                   np.array(energy).reshape(-1, 3), rejected)
@@ -0,0 +1,152 @@
+# Append-only journal of daily entries kept on local disk. An entry is
+# saved here first and sent to the daily sheet later, so it is not lost
+# when Google Sheets is slow or unreachable
+
+# fcntl library to lock the journal between app processes
+import fcntl
+
+# json library for the journal lines
+import json
+
+# os library to flush the journal to disk
+import os
+
+# contextmanager to hold the journal lock
+from contextlib import contextmanager
+
+# const for untracked journal file
+JOURNAL_FILE = "daily_journal.jsonl"
+
+# entries sent to the daily sheet in one batch
+SYNC_BATCH_ROWS = 500
+
+
+class Journal:
+    """
+    Journal of daily entries, one JSON line each, with a line recording
+    the id of the last entry sent after every batch. Entries after it are
+    pending. A line cut short by a crash is dropped when the journal is
+    next read.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+
+    @contextmanager
+    def locked(self):
+        """
+        Open the journal holding a lock shared by every app process.
+        """
+        with open(self.path, "a+b") as journal_file:
+            fcntl.flock(journal_file, fcntl.LOCK_EX)
+            try:
+                yield journal_file
+            finally:
+                fcntl.flock(journal_file, fcntl.LOCK_UN)
+
+    def read(self, journal_file):
+        """
+        Return the entries of an open journal and the last id sent.
+        """
+        journal_file.seek(0)
+        entries = []
+        synced = 0
+        good_size = 0
+        for line in journal_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            good_size += len(line)
+            if "synced" in record:
+                synced = record["synced"]
+            else:
+                entries.append((record["id"], record["row"]))
+
+        # Drop a line cut short by a crash
+        journal_file.truncate(good_size)
+        return entries, synced
+
+    def write(self, journal_file, *records):
+        """
+        Add records to an open journal and flush them to disk.
+        """
+        journal_file.seek(0, os.SEEK_END)
+        journal_file.write(b"".join(json.dumps(record).encode() + b"\n"
+                                    for record in records))
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+    def append(self, row):
+        """
+        Save a daily entry. Returns its id once it is on disk.
+        """
+        return self.extend([row])[0]
+
+    def extend(self, rows):
+        """
+        Save several daily entries with a single flush to disk. Returns
+        their ids.
+        """
+        with self.locked() as journal_file:
+            entries, synced = self.read(journal_file)
+            first_id = max([synced] + [id for id, row in entries]) + 1
+            entry_ids = list(range(first_id, first_id + len(rows)))
+            self.write(journal_file, *[{"id": entry_id, "row": row}
+                                       for entry_id, row
+                                       in zip(entry_ids, rows)])
+        return entry_ids
+
+    def pending(self):
+        """
+        Return the rows of the entries not yet sent.
+        """
+        with self.locked() as journal_file:
+            entries, synced = self.read(journal_file)
+        return [row for entry_id, row in entries if entry_id > synced]
+
+    def replay(self, send, batch_rows=SYNC_BATCH_ROWS):
+        """
+        Pass the pending rows to send, batch_rows at a time, recording
+        each batch once send returns. The journal is only locked while
+        it is read and written, not while send runs, so entries can be
+        saved meanwhile. A batch interrupted by a crash is passed again,
+        so send must skip rows already sent. Returns the number of rows
+        replayed, 0 if another app process is already replaying.
+        """
+        with open(self.path + ".sync", "a") as sync_file:
+            try:
+                fcntl.flock(sync_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # That process sends the entries saved here too
+                return 0
+            try:
+                return self.send_pending(send, batch_rows)
+            finally:
+                fcntl.flock(sync_file, fcntl.LOCK_UN)
+
+    def send_pending(self, send, batch_rows):
+        """
+        Send the pending entries, including entries saved while sending,
+        holding the replay lock.
+        """
+        replayed = 0
+        while True:
+            with self.locked() as journal_file:
+                entries, synced = self.read(journal_file)
+                batch = [entry for entry in entries
+                         if entry[0] > synced][:batch_rows]
+                if not batch:
+                    if entries:
+                        # Every entry is sent, start the journal again
+                        journal_file.truncate(0)
+                        self.write(journal_file, {"synced": synced})
+                    return replayed
+
+            send([row for entry_id, row in batch])
+            replayed += len(batch)
+
+            with self.locked() as journal_file:
+                self.write(journal_file, {"synced": batch[-1][0]})
@@ -0,0 +1,221 @@
+# Payback projection: a cumulative savings series kept month by month in
+# SQLite, payback on any date, and a forecast of the break-even month
+
+# isclose to find the months whose savings changed
+from math import isclose
+
+# numpy library for the savings series and the forecast
+import numpy as np
+
+# months forecast ahead when looking for the break-even month
+FORECAST_MONTHS = 600
+
+
+class PaybackProjection:
+    """
+    Monthly savings with their running total (a prefix sum), saved in
+    SQLite with the project cost and installation date. When a month
+    changes only it and the months after it are summed again, and the
+    savings up to any date are found with a binary search.
+
+    lock, a re-entrant lock, is held while the series is read or
+    changed, so it can share a connection with the refresh worker.
+    """
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+        with self.lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cumulative_savings (
+                    month TEXT PRIMARY KEY,
+                    savings REAL NOT NULL,
+                    cumulative REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS payback_settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+            rows = self.conn.execute(
+                "SELECT month, savings, cumulative FROM cumulative_savings "
+                "ORDER BY month").fetchall()
+        self.months = np.array([row[0] for row in rows],
+                               dtype="datetime64[M]")
+        self.savings = np.array([row[1] for row in rows], dtype=float)
+        self.cumulative = np.array([row[2] for row in rows], dtype=float)
+
+    def get_setting(self, key):
+        """
+        Return a saved project setting, or None if it is not set.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM payback_settings WHERE key = ?",
+                (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def project_cost(self):
+        """
+        Saved project cost, or None.
+        """
+        value = self.get_setting("project_cost")
+        return float(value) if value is not None else None
+
+    @property
+    def installation_date(self):
+        """
+        Saved installation date as datetime64[D], or None.
+        """
+        value = self.get_setting("installation_date")
+        return np.datetime64(value, "D") if value is not None else None
+
+    def set_project(self, project_cost, installation_date=None):
+        """
+        Save the project cost and, if given, the installation date.
+        """
+        settings = [("project_cost", str(project_cost))]
+        if installation_date is not None:
+            settings.append(("installation_date",
+                             str(np.datetime64(installation_date, "D"))))
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO payback_settings (key, value) "
+                "VALUES (?, ?)", settings)
+
+    def update_months(self, month_savings):
+        """
+        Bring the series in line with month_savings, a dict of the
+        savings of every month keyed on datetime64[M]. Only the months
+        from the first change onwards are summed and saved again.
+        """
+        with self.lock:
+            stored = dict(zip(self.months, self.savings))
+            changed = [month for month, savings in month_savings.items()
+                       if month not in stored
+                       or not isclose(stored[month], savings, abs_tol=1e-9)]
+            changed += [month for month in stored
+                        if month not in month_savings]
+            if not changed:
+                return
+
+            first = min(changed)
+            keep = int(np.searchsorted(self.months, first))
+            months = np.array(sorted(month_savings), dtype="datetime64[M]")
+            months = months[months >= first]
+            savings = np.array([month_savings[month] for month in months],
+                               dtype=float)
+            start = self.cumulative[keep - 1] if keep else 0.0
+            cumulative = start + np.cumsum(savings)
+
+            self.months = np.concatenate([self.months[:keep], months])
+            self.savings = np.concatenate([self.savings[:keep], savings])
+            self.cumulative = np.concatenate(
+                [self.cumulative[:keep], cumulative])
+
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM cumulative_savings WHERE month >= ?",
+                    (str(first),))
+                self.conn.executemany(
+                    "INSERT INTO cumulative_savings "
+                    "(month, savings, cumulative) VALUES (?, ?, ?)",
+                    [(str(month), float(saving), float(total))
+                     for month, saving, total
+                     in zip(months, savings, cumulative)])
+
+    def total_before(self, month):
+        """
+        Return the savings of the months before month.
+        """
+        index = np.searchsorted(self.months, month, side="left")
+        return float(self.cumulative[index - 1]) if index else 0.0
+
+    def savings_to(self, day):
+        """
+        Return the savings from the installation month up to and
+        including the month of day.
+        """
+        month = np.datetime64(day, "M")
+        with self.lock:
+            total = self.total_before(month + 1)
+            installation = self.installation_date
+            if installation is not None:
+                total -= self.total_before(np.datetime64(installation, "M"))
+        return total
+
+    def payback_at(self, day):
+        """
+        Return the savings up to day less the project cost, or None if
+        no project cost is saved.
+        """
+        project_cost = self.project_cost
+        if project_cost is None:
+            return None
+        return self.savings_to(day) - project_cost
+
+    def forecast_break_even(self):
+        """
+        Return the month the savings reach the project cost, as
+        datetime64[M]. Future months follow the trend and the seasonal
+        pattern of the months so far. Returns None without a project
+        cost or if the savings do not reach it within FORECAST_MONTHS.
+        """
+        project_cost = self.project_cost
+        with self.lock:
+            months = self.months
+            savings = self.savings
+            installation = self.installation_date
+            if installation is not None:
+                after = months >= np.datetime64(installation, "M")
+                months = months[after]
+                savings = savings[after]
+        if project_cost is None or not len(months):
+            return None
+
+        cumulative = np.cumsum(savings)
+        reached = np.flatnonzero(cumulative >= project_cost)
+        if len(reached):
+            return months[reached[0]]
+
+        # Months since the first month, and the calendar month of each
+        steps = (months - months[0]).astype(int)
+        future = steps[-1] + 1 + np.arange(FORECAST_MONTHS)
+        coefficients = fit_monthly_savings(steps, months, savings)
+        future_months = months[0] + future
+        predicted = np.maximum(
+            design_matrix(future, future_months, len(coefficients))
+            @ coefficients, 0)
+
+        totals = cumulative[-1] + np.cumsum(predicted)
+        index = int(np.searchsorted(totals, project_cost))
+        if index == len(totals):
+            return None
+        return future_months[index]
+
+
+def design_matrix(steps, months, columns):
+    """
+    Return the regression columns of each month: a trend and either one
+    level per calendar month (13 columns) or a single level (2 columns).
+    """
+    if columns == 13:
+        calendar = months.astype(int) % 12
+        seasons = np.zeros((len(steps), 12))
+        seasons[np.arange(len(steps)), calendar] = 1
+        return np.column_stack([steps, seasons])
+    return np.column_stack([steps, np.ones(len(steps))])
+
+
+def fit_monthly_savings(steps, months, savings):
+    """
+    Fit a trend with a level for each calendar month to the savings,
+    once there is a full year of months, or a straight line before that.
+    With a single month the trend is flat.
+    """
+    columns = 13 if len(np.unique(months.astype(int) % 12)) == 12 else 2
+    if len(savings) < 2:
+        return np.array([0.0, savings[0]])
+    matrix = design_matrix(steps, months, columns)
+    return np.linalg.lstsq(matrix, savings, rcond=None)[0]
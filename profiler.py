@@ -0,0 +1,148 @@
+# Tracer for the time spent in each menu action: Google Sheets calls,
+# waiting for the user, pauses and computing, with a report at exit and
+# an optional Chrome trace-event file (open it in chrome://tracing)
+
+# json library to write the trace file
+import json
+
+# os library for the process id in the trace
+import os
+
+# threading library to keep the current action of each thread
+import threading
+
+# time library to time spans and pause
+import time
+
+# contextmanager for the span and action blocks
+from contextlib import contextmanager
+
+# defaultdict library from collections
+from collections import defaultdict
+
+# prettytable library to display the report
+import prettytable
+
+# categories of time recorded inside an action, the rest is compute
+CATEGORIES = ["network", "input", "sleep"]
+
+
+class Profiler:
+    """
+    Record timed spans while enabled. Spans run inside an action (a menu
+    choice or refresh job) are added to that action's breakdown.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.events = []
+        self.actions = defaultdict(lambda: defaultdict(float))
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def record(self, name, category, start, end):
+        """
+        Keep a finished span for the trace file.
+        """
+        with self.lock:
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self.started) * 1e6),
+                "dur": round((end - start) * 1e6),
+                "pid": os.getpid(),
+                "tid": threading.get_ident()
+            })
+
+    @contextmanager
+    def span(self, name, category):
+        """
+        Time a block as network, input or sleep time of the current action.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.record(name, category, start, end)
+            action = getattr(self.local, "action", None)
+            if action is None:
+                # Outside a menu action, e.g. at startup
+                action = ("startup" if threading.current_thread()
+                          is threading.main_thread() else "background")
+                with self.lock:
+                    self.actions[action]["total"] += end - start
+            with self.lock:
+                self.actions[action][category] += end - start
+                if category == "network":
+                    self.actions[action]["calls"] += 1
+
+    @contextmanager
+    def action(self, name):
+        """
+        Time a block as one run of action name.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        self.local.action = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.local.action = None
+            self.record(name, "action", start, end)
+            with self.lock:
+                self.actions[name]["total"] += end - start
+                self.actions[name]["count"] += 1
+
+    def pause(self, seconds):
+        """
+        Sleep, recorded as sleep time.
+        """
+        with self.span("sleep", "sleep"):
+            time.sleep(seconds)
+
+    def report(self, requests=None):
+        """
+        Print the time of each action split into network, input, sleep
+        and compute. requests holds the Sheets requests made, retried and
+        throttled (see SheetsGateway.counters), printed below the table.
+        """
+        table = prettytable.PrettyTable([
+            "Action", "Runs", "Sheets calls", "Total (s)", "Network (s)",
+            "Input (s)", "Sleep (s)", "Compute (s)"
+            ])
+        for name, times in self.actions.items():
+            compute = times["total"] - sum(times[category]
+                                           for category in CATEGORIES)
+            table.add_row([name, int(times["count"]), int(times["calls"]),
+                           f"{times['total']:.3f}"]
+                          + [f"{times[category]:.3f}"
+                             for category in CATEGORIES]
+                          + [f"{max(compute, 0):.3f}"])
+        print("Time per action:")
+        print(table)
+        if requests is not None:
+            print(f"Google Sheets requests: {requests['calls']} made, "
+                  f"{requests['retried']} retried, {requests['throttled']} "
+                  "held back by the request budget.")
+
+    def write_trace(self, path):
+        """
+        Save the spans as a Chrome trace-event file.
+        """
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": self.events}, trace_file)
+
+
+# const for profiler shared by the app modules, off unless --profile
+PROFILER = Profiler()
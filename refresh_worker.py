@@ -0,0 +1,106 @@
+# Background worker that sends new daily data to the sheet and refreshes
+# the monthly and payback sheets, so the menu does not wait for them
+
+# queue library for the jobs waiting to run
+import queue
+
+# threading library for the worker thread
+import threading
+
+# tracer of the time spent in each job
+from profiler import PROFILER
+
+
+class RefreshWorker:
+    """
+    Run refresh jobs on a background thread, one at a time in the order
+    they were submitted. A job submitted while the same job is waiting
+    is merged into it, so several refreshes run as one.
+
+    handlers maps each job name to a function run with the job payload
+    and a merge function that combines two payloads.
+    """
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.jobs = queue.Queue()
+        self.payloads = {}
+        self.queued = set()
+        self.running = None
+        self.error = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, name, payload=None):
+        """
+        Queue job name with payload, merged into the job if it is waiting.
+        """
+        merge = self.handlers[name][1]
+        with self.lock:
+            if name in self.payloads:
+                self.payloads[name] = merge(self.payloads[name], payload)
+            else:
+                self.payloads[name] = payload
+            if name not in self.queued:
+                self.queued.add(name)
+                self.jobs.put(name)
+
+            self.start()
+
+    def start(self):
+        """
+        Start the worker thread if it is not running, called holding the
+        lock.
+        """
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        """
+        Run queued jobs until the program exits.
+        """
+        while True:
+            name = self.jobs.get()
+            handler, merge = self.handlers[name]
+            with self.lock:
+                payload = self.payloads.pop(name)
+                self.queued.discard(name)
+                self.running = name
+
+            try:
+                with PROFILER.action(f"Refresh {name}"):
+                    handler(payload)
+                self.error = None
+            except Exception as e:
+                # Keep the job so it runs again with the next refresh, any
+                # error (e.g. a locked cache database) leaves the worker
+                # running
+                self.error = e
+                with self.lock:
+                    if name in self.payloads:
+                        payload = merge(payload, self.payloads[name])
+                    self.payloads[name] = payload
+            finally:
+                self.running = None
+                self.jobs.task_done()
+
+    def is_pending(self):
+        """
+        Check if a job is waiting, running or kept after an error.
+        """
+        return bool(self.payloads) or self.running is not None
+
+    def wait(self):
+        """
+        Run the jobs kept after an error again and wait for every job.
+        """
+        with self.lock:
+            for name in self.payloads:
+                if name not in self.queued:
+                    self.queued.add(name)
+                    self.jobs.put(name)
+            if self.thread is not None:
+                self.start()
+        if self.thread is not None:
+            self.jobs.join()
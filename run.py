@@ -1,44 +1,244 @@
-# Settings and credentials to allow access, read and modify data in
-# Google Sheets
-import gspread
-from google.oauth2.service_account import Credentials
-
-# time library to add delay
-import time
+# Exceptions raised by the Google Sheets API and its authorization
+from gspread.exceptions import GSpreadException
+from google.auth.exceptions import GoogleAuthError
 
 # os library to clear screen
 import os
 
+# sys library to read command line options
+import sys
+
+# argparse library for the command line options and commands
+import argparse
+
+# json library for the command results
+import json
+
+# contextlib library to send progress messages to stderr
+import contextlib
+
+# csv library to write the import reject report
+import csv
+
 # datetime library to add date and time
-from datetime import datetime
+from datetime import date, datetime
 
 # defaultdict library from collections
 from collections import defaultdict
 
+# isclose to compare calculated totals
+from math import isclose
+
+# numpy library for dates passed to the tariff
+import numpy as np
+
 # prettytable library to display tabular data
 import prettytable
 
 # colorama for text color formatting
 from colorama import init, Fore, Style
 
+# local cache of the worksheets
+from sheet_cache import SheetCache, CACHE_FILE
+
+# vectorized aggregation of the daily data
+from aggregate import load_daily_arrays, group_totals
+
+# fast parsing and formatting of the worksheet dates
+from dates import (parse_day, parse_month, parse_date, day_ordinals,
+                   format_day, format_month)
+
+# tariff rates used to calculate savings
+from tariff import load_tariff
+
+# reader for bulk daily data files
+from daily_import import read_daily_file
+
+# store of smart meter interval readings
+from interval_store import IntervalStore, is_interval_file, STORE_DIR
+
+# credentials and opening of a google sheet
+from sheets_auth import open_spreadsheet
+
+# client of the shared sheets broker
+from sheets_broker import BrokerSpreadsheet
+
+# request budget and retries of the Google Sheets API calls
+from sheets_gateway import SheetsGateway
+
+# background refresh of the monthly and payback sheets
+from refresh_worker import RefreshWorker
+
+# local journal of daily entries waiting to be sent
+from journal import Journal, JOURNAL_FILE
+
+# sites with their own google sheet and local files
+from sites import load_sites, selected_site, site_path
+
+# monthly rollups of every site for the fleet summary
+from fleet import FleetStore
+
+# tracer of the time spent in each menu action
+from profiler import PROFILER
+
+# cumulative savings series and break-even forecast
+from payback import PaybackProjection, FORECAST_MONTHS
+
+# rolling window and yearly energy statistics
+from stats import EnergyStats, energy_ratios, WINDOW_DAYS
+
+# typed columnar snapshot of the daily, monthly and payback data
+from snapshot import Snapshot, SNAPSHOT_DIR
+
 # initialize colorama
 init(autoreset=True)
 
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive"
-    ]
+# const for google sheet name of each site
+SITES = load_sites()
+# const for site chosen with --site or SOLAR_SITE
+SITE = selected_site(SITES, sys.argv[1:])
+# const for google sheet name of the site
+SHEET_NAME = SITES[SITE]
+
+# google sheet, opened on first use by get_spreadsheet
+SHEET = None
+# const for gateway every Google Sheets API call goes through
+GATEWAY = SheetsGateway()
+# const for local write-through cache of the worksheets
+CACHE = SheetCache(lambda: get_spreadsheet(),
+                   path=site_path(SITE, CACHE_FILE), gateway=GATEWAY)
+
+# seconds the opening screen is shown, 0 skips the delay
+SPLASH_SECONDS = float(os.environ.get("SOLAR_SPLASH_SECONDS", "6"))
+
+# const printed by a pooled worker once it is ready to be claimed
+WORKER_READY = "SOLAR_WORKER_READY"
+
+# dates already entered in the daily sheet, built once per session
+DATE_INDEX = None
+
+# const for dated tariff rates used to calculate savings
+TARIFF = load_tariff()
+
+# largest difference allowed when checking monthly totals
+MONTHLY_TOLERANCE = 0.001
+
+# names of the periods daily data can be grouped by
+PERIOD_NAMES = {"W": "weekly", "M": "monthly", "Y": "yearly"}
+
+# rows shown on each page of the daily data
+PAGE_ROWS = 15
+
+# rows written per append_rows call when importing daily data
+IMPORT_CHUNK_ROWS = 500
+
+# names of the menu actions in the profile report
+MENU_ACTIONS = {
+    "1": "Enter daily data",
+    "2": "Import daily data file",
+    "3": "View daily data",
+    "4": "View monthly data",
+    "5": "Enter and View project payback",
+    "6": "View statistics",
+    "7": "View fleet summary",
+    "8": "Exit"
+}
 
-# const for untracked creds file
-CREDS = Credentials.from_service_account_file('creds.json')
+# const for cumulative savings, project cost and installation date
+PAYBACK = PaybackProjection(CACHE.conn, CACHE.lock)
 
-# const for credentials scope
-SCOPED_CREDS = CREDS.with_scopes(SCOPE)
-# const to allow auth of gspread client within these scoped credentials
-GSPREAD_CLIENT = gspread.authorize(SCOPED_CREDS)
-# const for google sgeet
-SHEET = GSPREAD_CLIENT.open('solar_system')
+# const for yearly and rolling window totals of the daily data
+STATS = EnergyStats(CACHE.conn, CACHE.lock)
+
+# const for cache setting holding the daily sheet version of the STATS
+STATS_VERSION = "stats_version"
+
+# const for memory-mapped columns of the daily, monthly and payback data
+SNAPSHOT = Snapshot(site_path(SITE, SNAPSHOT_DIR))
+
+# const for local journal daily entries are saved to before the sheet
+JOURNAL = Journal(site_path(SITE, JOURNAL_FILE))
+
+# const for monthly rollups of every site
+FLEET = FleetStore()
+
+# commands run without the pauses shown to a user
+SCRIPTED = False
+
+# exit codes of the commands, 2 is a usage error reported by argparse
+EXIT_OK = 0
+EXIT_INVALID = 1
+EXIT_SHEETS = 3
+
+# const for background refresh of the daily, monthly and payback sheets,
+# each job with its function and how waiting payloads are merged
+REFRESH = RefreshWorker({
+    "sync": (lambda payload: sync_journal(),
+             lambda payload, new: None),
+    "monthly": (lambda deltas: refresh_monthly(deltas),
+                lambda deltas, new: merge_deltas(deltas, new)),
+    "payback": (lambda payload: refresh_payback(payload),
+                lambda payload, new: None)
+})
+
+
+def get_spreadsheet():
+    """
+    Open the google sheet of the site on first use.
+    """
+    global SHEET
+
+    if SHEET is None:
+        SHEET = connect_spreadsheet(SHEET_NAME)
+
+    return SHEET
+
+
+def connect_spreadsheet(name):
+    """
+    Open google sheet name, through the shared sheets broker when one is
+    running on the server.
+    """
+    broker_socket = os.environ.get("SOLAR_BROKER_SOCKET")
+    if broker_socket:
+        try:
+            return BrokerSpreadsheet(broker_socket, name)
+        except OSError:
+            # Broker not running, connect directly instead
+            pass
+    return GATEWAY.call(open_spreadsheet, name)
+
+
+def wait_for_claim():
+    """
+    Warm up a pooled worker, then wait until the server claims it for a
+    new terminal connection.
+    """
+    try:
+        get_spreadsheet()
+    except (OSError, ValueError, GoogleAuthError, GSpreadException):
+        # Connect again on first use instead
+        pass
+
+    print(WORKER_READY, flush=True)
+    sys.stdin.readline()
+
+
+def pause(seconds):
+    """
+    Wait so the user can read a message, shown as sleep time when
+    profiling. Commands do not wait.
+    """
+    if not SCRIPTED:
+        PROFILER.pause(seconds)
+
+
+def ask(prompt):
+    """
+    Read the user's answer to prompt, shown as input time when profiling.
+    """
+    with PROFILER.span("input", "input"):
+        return input(prompt)
 
 
 # Credit: https://www.101computing.net/python-typing-text-effect/
@@ -70,10 +270,10 @@ def prog_start():
     ''')
     print(Fore.YELLOW + Style.BRIGHT + "      Solar Generation and Energy Use "
           "Data Logging System.\n")
-    time.sleep(1)
+    pause(min(1, SPLASH_SECONDS))
     print(Fore.YELLOW + Style.BRIGHT + "   (Created for Educational Purposes -"
           " Copyright: Gary Broderick '24)")
-    time.sleep(5)
+    pause(max(0, SPLASH_SECONDS - 1))
     clear_screen()
 
 
@@ -87,12 +287,10 @@ def get_daily_data():
               "Consumed (kW), Export (kW), Import (kW).\n")
         print("Example: 3 Jun 2024, 5.154, 20.698, 6.354\n")
 
-        data_str = input("Enter your data here: \n")
+        data_str = ask("Enter your data here: \n")
         print()
 
-        data_str = data_str.lstrip("0")
-        data_str = data_str.title()
-        daily_data = data_str.split(",")
+        daily_data = split_daily_data(data_str)
 
         if validate_daily_data(daily_data):
             print(Fore.GREEN + 'Data is valid.\n')
@@ -101,65 +299,97 @@ def get_daily_data():
     return daily_data
 
 
-def validate_daily_data(values):
+def split_daily_data(data_str):
+    """
+    Split a line of daily data, e.g. 3 Jun 2024, 5.154, 20.698, 6.354,
+    into its values.
+    """
+    data_str = data_str.lstrip("0")
+    data_str = data_str.title()
+    return data_str.split(",")
+
+
+def validate_daily_data(values, batch_dates=None):
     """
     Validate daily data input.
+    batch_dates is an optional set of dates already accepted in the same
+    submission, valid dates are added to it.
+    """
+    errors = check_daily_data(values, batch_dates)
+
+    for error in errors:
+        print(Fore.RED + error)
+
+    return not errors
+
+
+def check_daily_data(values, batch_dates=None):
+    """
+    Check daily data and return the error messages found, if any.
     """
     if len(values) != 4:
-        print(Fore.RED + "Exactly 4 values required, "
-              f"you provided {len(values)}.\n")
-        return False
+        return [f"Exactly 4 values required, you provided {len(values)}.\n"]
 
     # Validate date format (Day Month Year)
     try:
-        daily_date = datetime.strptime(values[0].strip(), "%d %b %Y")
+        input_date = parse_day(values[0].strip())
     except ValueError:
-        print(Fore.RED + "Invalid date format. "
-              "Please use Day Month Year format.")
-        print("(e.g., 3 Jun 2024).\n")
-        return False
+        return [
+            "Invalid date format. Please use Day Month Year format.",
+            "(e.g., 3 Jun 2024).\n"
+            ]
 
     # Validate daily energy data (Consumed (kW), Export (kW), Import (kW))
     try:
         new_list = values[1:]
         [float(value) for value in new_list]
     except ValueError as e:
-        print(Fore.RED + f"Invalid data: {e}.\n")
-        print(Fore.RED + "Invalid energy data. Please enter a valid number.\n")
-        return False
+        return [
+            f"Invalid data: {e}.\n",
+            "Invalid energy data. Please enter a valid number.\n"
+            ]
 
-    # Create two datetime objects with time
-    datetime1 = datetime.strptime(values[0].strip(), "%d %b %Y")
-    datetime2 = datetime.today()
-
-    # Extract dates from datetime objects
-    input_date = datetime1.date()
-    todays_date = datetime2.date()
+    todays_date = datetime.today().date()
 
     # Compare dates
     if input_date > todays_date:
-        print(Fore.RED + f"Invalid date, you provided {values[0]}.\n")
-        print(Fore.RED + "Date provided is too late, no data generated.\n")
-        return False
+        return [
+            f"Invalid date, you provided {values[0]}.\n",
+            "Date provided is too late, no data generated.\n"
+            ]
     elif input_date == todays_date:
-        print(Fore.RED + f"Invalid date, you provided {values[0]}.\n")
-        print(Fore.RED + "Date provided is todays date, no data generated.\n")
-        return False
+        return [
+            f"Invalid date, you provided {values[0]}.\n",
+            "Date provided is todays date, no data generated.\n"
+            ]
 
-    # Validate duplicate date format (Day Month Year)
-    daily_date = datetime.strptime(values[0].strip(), "%d %b %Y")
-    daily = SHEET.worksheet("daily")
-    dates = daily.col_values(1)
-    new_dates_list = dates[1:]
-    new_format = values[0].lstrip("0")
-    count = new_dates_list.count(new_format)
-
-    if count == 1:
-        print(Fore.RED + "Duplicate date entered, "
-              f"you provided {values[0]}.\n")
-        return False
+    # Validate duplicate date against the sheet and this submission
+    if input_date in get_date_index() or (
+            batch_dates is not None and input_date in batch_dates):
+        return [f"Duplicate date entered, you provided {values[0]}.\n"]
 
-    return True
+    if batch_dates is not None:
+        batch_dates.add(input_date)
+
+    return []
+
+
+def get_date_index():
+    """
+    Return the set of dates already entered, in the daily sheet or
+    waiting in the journal.
+    """
+    global DATE_INDEX
+
+    if DATE_INDEX is None:
+        date_strs = CACHE.col_values("daily", 1)[1:]
+        date_strs += [row[0] for row in JOURNAL.pending()]
+        # Strings that are not dates give ordinal 0 and are left out
+        DATE_INDEX = {date.fromordinal(ordinal)
+                      for ordinal in set(day_ordinals(date_strs).tolist())
+                      if ordinal}
+
+    return DATE_INDEX
 
 
 def validate_project_data(data):
@@ -187,103 +417,660 @@ def validate_project_data(data):
 
 def update_daily_worksheet(data):
     """
-    Update daily worksheet, add new row with the list data provided
+    Save the list data provided to the journal, it is added to the daily
+    worksheet in the background.
     """
-    print("Updating daily worksheet...\n")
-    daily_worksheet = SHEET.worksheet("daily")
-    daily_worksheet.append_row(data)
-    print(Fore.GREEN + "Daily worksheet updated successfully.\n")
+    print("Saving daily data...\n")
+    save_daily_rows([data])
+    print(Fore.GREEN + "Daily data saved successfully.\n")
 
 
-def calculate_month():
+def save_daily_rows(rows):
     """
-    Calculate month based on the daily data.
+    Save validated daily rows to the journal in one write and send them
+    to the daily worksheet in the background.
+    """
+    JOURNAL.extend(rows)
+    for row in rows:
+        get_date_index().add(parse_day(row[0].strip()))
+    REFRESH.submit("sync")
+
+
+def sync_journal():
     """
-    print("Calculating monthly data...\n")
-    daily_worksheet = SHEET.worksheet("daily")
-    daily_data = daily_worksheet.get_all_values()[1:]  # Skipping header row
-    grouped_data = defaultdict(lambda: {
+    Refresh job sending the journal entries to the daily worksheet in
+    batches. The months of each batch are updated before the batch is
+    recorded as sent, so a session cut off in between sends it again.
+    Days already in the worksheet, e.g. sent before a crash, are not
+    added again and their months are calculated again from the daily
+    data instead.
+    """
+    def send(rows):
+        # Check the sheet itself, another process may have added days
+        CACHE.revalidate(force=True)
+        sheet_dates = set(
+            day_ordinals(CACHE.col_values("daily", 1)[1:]).tolist())
+
+        new_rows = []
+        sent_months = set()
+        for row in rows:
+            day = parse_day(row[0].strip())
+            if day.toordinal() in sheet_dates:
+                sent_months.add(format_month(day))
+            else:
+                sheet_dates.add(day.toordinal())
+                new_rows.append(row)
+
+        deltas = {}
+        if new_rows:
+            version = CACHE.local_version("daily")
+            CACHE.append_rows("daily", new_rows)
+            update_daily_stats(new_rows, version)
+            for row in new_rows:
+                month_year, delta = daily_delta(row)
+                merge_deltas(deltas, {month_year: delta})
+
+        if sent_months:
+            # The whole month is recalculated, including the new days
+            for month_year in sent_months:
+                deltas.pop(month_year, None)
+            deltas.update(month_corrections(sent_months))
+
+        if deltas:
+            # Held in the cache file, so the writes outlive the session
+            refresh_monthly(deltas)
+
+    JOURNAL.replay(send)
+
+
+def import_daily_data(path):
+    """
+    Import daily data from a CSV or inverter export file.
+    Valid rows are appended in chunks, the affected months are updated
+    once at the end and invalid lines are written to a reject report.
+    Files of interval readings are imported with import_interval_data.
+    """
+    if is_interval_file(path):
+        return import_interval_data(path), []
+
+    batch_dates = set()
+    pending_rows = []
+    rejects = []
+    deltas = defaultdict(lambda: {
         "consumed": 0,
         "exported": 0,
         "imported": 0,
-        "count": 0
+        "savings": 0
     })
+    imported_count = 0
+
+    print("Importing daily data...\n")
+
+    for line_number, fields, values in read_daily_file(path):
+        errors = check_daily_data(values, batch_dates)
+        if errors:
+            rejects.append([line_number, ",".join(fields), errors[0].strip()])
+            continue
+
+        consumed, exported, imported = [float(value) for value in values[1:]]
+        pending_rows.append([values[0], consumed, exported, imported])
+
+        month_year, delta = daily_delta(pending_rows[-1])
+        for key, value in delta.items():
+            deltas[month_year][key] += value
+
+        if len(pending_rows) == IMPORT_CHUNK_ROWS:
+            imported_count += append_daily_rows(pending_rows)
+            pending_rows = []
+
+    if pending_rows:
+        imported_count += append_daily_rows(pending_rows)
+
+    if deltas:
+        REFRESH.submit("monthly", dict(deltas))
+
+    print(Fore.GREEN + f"{imported_count} daily entries imported.\n")
+
+    if rejects:
+        reject_path = f"{path}.rejects.csv"
+        with open(reject_path, "w", newline="") as reject_file:
+            writer = csv.writer(reject_file)
+            writer.writerow(["Line", "Data", "Reason"])
+            writer.writerows(rejects)
+        print(Fore.RED + f"{len(rejects)} lines rejected, "
+              f"see {reject_path}.\n")
+
+    return imported_count, rejects
+
+
+def append_daily_rows(rows):
+    """
+    Append a chunk of validated rows to the daily worksheet.
+    """
+    version = CACHE.local_version("daily")
+    CACHE.append_rows("daily", rows)
+    update_daily_stats(rows, version)
+    for row in rows:
+        get_date_index().add(parse_day(row[0]))
+    return len(rows)
+
+
+def update_daily_stats(rows, version):
+    """
+    Add daily rows written to the daily sheet to the statistics. version
+    is the version of the daily sheet before the rows were written, if
+    the statistics were built from it they are still up to date.
+    """
+    current = CACHE.get_meta(STATS_VERSION) == version
+    STATS.set_days([(parse_day(str(row[0]).strip()),
+                     *[float(value) for value in row[1:4]])
+                    for row in rows])
+    if current:
+        CACHE.set_meta(STATS_VERSION, CACHE.local_version("daily"))
+
+
+def rebuild_stats():
+    """
+    Build the statistics again from the daily data.
+    """
+    # Read first, so newer data is never recorded under it
+    version = CACHE.version("daily")
+    STATS.rebuild(*daily_arrays())
+    CACHE.set_meta(STATS_VERSION, version)
+
+
+def import_interval_data(path):
+    """
+    Import smart meter interval readings into the interval store and
+    update the daily summary from it.
+    """
+    print("Importing interval readings...\n")
+
+    store = IntervalStore(site_path(SITE, STORE_DIR))
+    appended, skipped = store.ingest(path)
+
+    print(Fore.GREEN + f"{appended} interval readings stored.\n")
+    if skipped:
+        print(Fore.RED + f"{skipped} readings skipped, invalid or at "
+              "a time already stored.\n")
+
+    return sync_daily_summary(store)
 
-    # Group data by month and calculate total energy use
-    for row in daily_data:
-        date_str = row[0].strip()
-        # Adjust date string to include the day if only month is provided
-        if len(date_str.split()) == 1:
-            date_str = f"1 {date_str}"  # Assuming first day of the month
-        daily_date = datetime.strptime(date_str, "%d %b %Y")
-        month_year = daily_date.strftime("%b %Y")
-        consumed = float(row[1])
-        exported = float(row[2])
-        imported = float(row[3])
-        grouped_data[month_year]["consumed"] += consumed
-        grouped_data[month_year]["exported"] += exported
-        grouped_data[month_year]["imported"] += imported
-        grouped_data[month_year]["count"] += 1
-
-    for month_year, info in grouped_data.items():
-        consumed = info["consumed"]
-        exported = info["exported"]
-        imported = info["imported"]
-        monthly_saving = ((consumed - imported) * 0.2887) + (exported * 0.24)
-        grouped_data[month_year]["savings"] = monthly_saving
+
+def sync_daily_summary(store):
+    """
+    Write the daily totals of the interval store to the daily sheet.
+    Days before today are added, or updated if their totals changed,
+    and the affected months are updated once at the end.
+    """
+    keys, totals = store.rollup("D")
+    today = np.datetime64(datetime.today().date())
+    daily_rows = CACHE.get_all_values("daily")
+
+    # Row number of each day already in the sheet
+    ordinals = day_ordinals([row[0] for row in daily_rows[1:]])
+    positions = {date.fromordinal(ordinal): position
+                 for position, ordinal in enumerate(ordinals.tolist(), 2)
+                 if ordinal}
+
+    new_rows = []
+    updates = []
+    deltas = defaultdict(lambda: {
+        "consumed": 0,
+        "exported": 0,
+        "imported": 0,
+        "savings": 0
+    })
+
+    for key, total in zip(keys, totals):
+        if key >= today:
+            continue
+
+        day = key.astype(object)
+        row = [format_day(day)]
+        row.extend(round(float(value), 3) for value in total)
+        month_year, delta = daily_delta(row)
+
+        position = positions.get(day)
+        if position is None:
+            new_rows.append(row)
+        else:
+            old_row = daily_rows[position - 1][:4]
+            old_values = [float(value or 0) for value in old_row[1:]]
+            if all(isclose(old, new, abs_tol=MONTHLY_TOLERANCE)
+                   for old, new in zip(old_values, row[1:])):
+                continue
+            updates.append({
+                "range": f"A{position}:D{position}",
+                "values": [row]
+            })
+            # Only the change to the day is added to its month
+            old_delta = daily_delta([row[0]] + old_values)[1]
+            for name in delta:
+                delta[name] -= old_delta[name]
+
+        for name, value in delta.items():
+            deltas[month_year][name] += value
+
+    for start in range(0, len(new_rows), IMPORT_CHUNK_ROWS):
+        append_daily_rows(new_rows[start:start + IMPORT_CHUNK_ROWS])
+    if updates:
+        version = CACHE.local_version("daily")
+        CACHE.batch_update("daily", updates)
+        update_daily_stats([update["values"][0] for update in updates],
+                           version)
+
+    if deltas:
+        REFRESH.submit("monthly", dict(deltas))
+
+    print(Fore.GREEN + f"{len(new_rows)} days added and {len(updates)} "
+          "days updated from interval readings.\n")
+
+    return len(new_rows) + len(updates)
+
+
+def get_import_path():
+    """
+    Get the path of a daily data file from the user.
+    """
+    while True:
+        print(Fore.BLUE + "Please enter the path of your daily data file.\n")
+        print("Format: CSV file with one day per line, or a daily "
+              "inverter export.\n")
+        print("Example: data/june-2024.csv\n")
+
+        path = ask("Enter your file path here: \n").strip()
+        print()
+
+        if os.path.isfile(path):
+            return path
+
+        print(Fore.RED + f"File not found, you provided {path}.\n")
+
+
+def calculate_month():
+    """
+    Calculate month based on the daily data.
+    """
+    return calculate_period_totals("M")
+
+
+def calculate_period_totals(period, quiet=False):
+    """
+    Calculate weekly ("W"), monthly ("M") or yearly ("Y") totals and
+    savings from the daily data, in date order. quiet is set by the
+    background refresh, which does not print.
+    """
+    if not quiet:
+        print(f"Calculating {PERIOD_NAMES[period]} data...\n")
+
+    # Group data by period and calculate total energy use
+    dates, energy = daily_arrays()
+    keys, totals, counts = group_totals(dates, energy, period)
+
+    # Savings use the tariff rates in force on each day
+    daily_savings = TARIFF.savings(
+        dates, energy[:, 0], energy[:, 1], energy[:, 2])
+    savings = group_totals(dates, daily_savings, period)[1]
+
+    grouped_data = {}
+    for key, total, saving, count in zip(
+            keys.astype(object), totals, savings, counts):
+        grouped_data[period_label(key, period)] = {
+            "consumed": float(total[0]),
+            "exported": float(total[1]),
+            "imported": float(total[2]),
+            "count": int(count),
+            "savings": float(saving)
+        }
 
     return grouped_data
 
 
+def update_daily_snapshot():
+    """
+    Parse the daily sheet into the snapshot if it changed since the
+    snapshot was taken. Returns the number of rows written.
+    """
+    # The sheet cannot change between its version and its rows
+    with CACHE.lock:
+        version = CACHE.version("daily")
+        if SNAPSHOT.version("daily") == version:
+            return 0
+        # Skipping header row
+        dates, energy = load_daily_arrays(CACHE.get_all_values("daily")[1:])
+        return SNAPSHOT.update("daily", {
+            "date": dates,
+            "consumed": energy[:, 0],
+            "exported": energy[:, 1],
+            "imported": energy[:, 2]
+        }, version)
+
+
+def daily_arrays():
+    """
+    Return the dates and the consumed, exported and imported energy of
+    the daily data, read memory-mapped from the snapshot. Only a daily
+    sheet changed since the snapshot was taken is parsed again.
+    """
+    update_daily_snapshot()
+    # Every column mapped from the same version of the table
+    with SNAPSHOT.locked():
+        columns = SNAPSHOT.columns("daily")
+    return columns["date"], np.column_stack(
+        [columns["consumed"], columns["exported"], columns["imported"]])
+
+
+def export_snapshot():
+    """
+    Bring the daily, monthly and payback tables of the snapshot up to
+    date with the sheets. Monthly and payback rows that are not valid
+    are left out and written to a reject report. Returns the rows, the
+    rows written and the rows rejected of each table.
+    """
+    written = {"daily": update_daily_snapshot()}
+    rejects = []
+
+    with CACHE.lock:
+        version = CACHE.version("monthly")
+        month_keys = []
+        month_values = []
+        monthly_rows = CACHE.get_all_values("monthly")
+        for row_number, row in enumerate(monthly_rows[1:], start=2):
+            try:
+                month = parse_month(row[0].strip())
+                values = [float(value) for value in row[1:5]]
+                if len(values) != 4:
+                    raise ValueError("Missing values")
+            except (ValueError, IndexError) as e:
+                rejects.append(["monthly", row_number, ",".join(row), str(e)])
+                continue
+            month_keys.append(month)
+            month_values.append(values)
+        month_values = np.array(month_values, dtype=float).reshape(-1, 4)
+        written["monthly"] = SNAPSHOT.update("monthly", {
+            "month": np.array(month_keys, dtype="datetime64[M]"),
+            "consumed": month_values[:, 0],
+            "exported": month_values[:, 1],
+            "imported": month_values[:, 2],
+            "savings": month_values[:, 3]
+        }, version)
+
+    # One payback row a day, a later export that day replaces it
+    today = np.datetime64(datetime.today().date(), "D")
+    payback_rows = SNAPSHOT.columns("payback")
+    earlier = payback_rows["date"] < today
+    dates = list(payback_rows["date"][earlier])
+    paybacks = list(payback_rows["payback"][earlier])
+    payback_cell = (CACHE.get_all_values("payback")[1:2] or [[""]])[0]
+    # No payback is calculated until a project cost is entered
+    if payback_cell and payback_cell[0].strip():
+        try:
+            paybacks.append(float(payback_cell[0]))
+            dates.append(today)
+        except ValueError as e:
+            rejects.append(["payback", 2, ",".join(payback_cell), str(e)])
+    written["payback"] = SNAPSHOT.update("payback", {
+        "date": np.array(dates, dtype="datetime64[D]"),
+        "payback": np.array(paybacks, dtype=float)
+    })
+
+    if rejects:
+        reject_path = os.path.join(SNAPSHOT.path, "rejects.csv")
+        with open(reject_path, "w", newline="") as reject_file:
+            writer = csv.writer(reject_file)
+            writer.writerow(["Sheet", "Row", "Data", "Reason"])
+            writer.writerows(rejects)
+        print(Fore.RED + f"{len(rejects)} rows left out, see {reject_path}.\n")
+
+    return {table: {"rows": SNAPSHOT.length(table), "written": count,
+                    "rejected": sum(reject[0] == table for reject in rejects)}
+            for table, count in written.items()}
+
+
+def period_label(start_date, period):
+    """
+    Format the start date of a week, month or year for display.
+    """
+    if period == "W":
+        return f"Week of {format_day(start_date)}"
+    elif period == "Y":
+        return str(start_date.year)
+    return format_month(start_date)
+
+
+def daily_delta(daily_row):
+    """
+    Return the month year of a daily row and the amounts it adds to the
+    month, including its savings at the tariff rates of that day.
+    """
+    daily_date = parse_day(daily_row[0].strip())
+    consumed, exported, imported = [float(value) for value in daily_row[1:4]]
+    savings = TARIFF.savings(
+        np.datetime64(daily_date), consumed, exported, imported)
+
+    return format_month(daily_date), {
+        "consumed": consumed,
+        "exported": exported,
+        "imported": imported,
+        "savings": float(savings)
+    }
+
+
 def update_monthly_worksheet():
     """
-    Update the monthly sheet with the calculated month data.
+    Rebuild the monthly sheet from the full daily data, used for repairs.
+    Returns the number of Google Sheets API calls made.
     """
-    monthly = SHEET.worksheet("monthly")
+    # Let background refreshes finish so they cannot write over it
+    REFRESH.wait()
+    calls_before = CACHE.api_calls
 
     # Calculate month
     month_data = calculate_month()
 
     print("Updating monthly worksheet...\n")
 
-    month_list = []
-
-    # Update monthly sheet for each month
+    # Build the whole month block in memory, one row per month
+    month_rows = []
     for month_year, info in month_data.items():
-        month_list.append(month_year)
-        # credit: https://stackoverflow.com/questions/75731307/
-        monthly.update([[a] for a in month_list], "A2")
-        month_cells = monthly.findall(month_year)
-        if month_cells:
-            row_index = month_cells[0].row
-            monthly.update_cell(row_index, 2, info["consumed"])
-            monthly.update_cell(row_index, 3, info["exported"])
-            monthly.update_cell(row_index, 4, info["imported"])
-            monthly.update_cell(row_index, 5, info["savings"])
+        month_rows.append([
+            month_year,
+            info["consumed"],
+            info["exported"],
+            info["imported"],
+            info["savings"]
+            ])
+
+    # Write every month in a single range update starting at A2
+    if month_rows:
+        CACHE.update("monthly", month_rows, "A2")
+    FLEET.save_site_months(SITE, month_rows)
+    update_savings_series(month_rows)
+    rebuild_stats()
+
+    api_calls = CACHE.api_calls - calls_before
+
+    print(Fore.GREEN + "Monthly worksheet updated successfully "
+          f"({api_calls} API calls).\n")
+
+    pause(3)
+
+    return api_calls
+
+
+def month_corrections(month_years):
+    """
+    Return the deltas bringing the months month_years of the monthly
+    sheet to the totals calculated from the daily data.
+    """
+    month_data = calculate_period_totals("M", quiet=True)
+    sheet_totals = {}
+    for row in CACHE.get_all_values("monthly")[1:]:
+        sheet_totals[row[0].strip()] = [float(value or 0)
+                                        for value in row[1:5]]
+
+    deltas = {}
+    for month_year in month_years:
+        info = month_data.get(month_year)
+        if info is None:
+            continue
+        totals = sheet_totals.get(month_year, [0, 0, 0, 0])
+        deltas[month_year] = {
+            name: info[name] - total
+            for name, total in zip(
+                ["consumed", "exported", "imported", "savings"], totals)
+        }
+    return deltas
+
+
+def merge_deltas(deltas, new_deltas):
+    """
+    Add new_deltas to the monthly deltas waiting to be applied.
+    """
+    for month_year, delta in new_deltas.items():
+        if month_year in deltas:
+            for name, value in delta.items():
+                deltas[month_year][name] += value
+        else:
+            deltas[month_year] = dict(delta)
+    return deltas
+
+
+def refresh_monthly(deltas):
+    """
+    Refresh job applying monthly deltas, followed by a payback refresh.
+    """
+    apply_monthly_deltas(deltas)
+    month_rows = CACHE.get_all_values("monthly")[1:]
+    FLEET.save_site_months(SITE, month_rows)
+    update_savings_series(month_rows)
+    REFRESH.submit("payback")
+
+
+def refresh_payback(payload):
+    """
+    Refresh job recalculating the payback with the last project cost
+    entered, then sending the held sheet writes.
+    """
+    payback = PAYBACK.payback_at(datetime.today().date())
+    if payback is not None:
+        CACHE.update("payback", [[payback]], "A2", urgent=False)
+    CACHE.flush()
+
+
+def update_savings_series(month_rows):
+    """
+    Bring the cumulative savings series in line with the monthly rows.
+    """
+    month_savings = {}
+    for row in month_rows:
+        try:
+            month = np.datetime64(parse_date(row[0].strip()), "M")
+            month_savings[month] = float(row[4] or 0)
+        except (ValueError, IndexError):
+            continue
+    PAYBACK.update_months(month_savings)
+
+
+def apply_monthly_deltas(deltas):
+    """
+    Apply energy deltas to the affected months of the monthly sheet.
+    Deltas map a month year (e.g. Jun 2024) to consumed, exported,
+    imported and savings amounts. Only the affected month rows are
+    written back.
+    """
+    month_rows = CACHE.get_all_values("monthly")
+
+    # Row number of each month already in the sheet
+    row_numbers = {}
+    for row_index, row in enumerate(month_rows[1:], start=2):
+        row_numbers[row[0].strip()] = row_index
+
+    next_row = len(month_rows) + 1
+    updates = []
+
+    for month_year, delta in deltas.items():
+        if month_year in row_numbers:
+            row_index = row_numbers[month_year]
+            row = month_rows[row_index - 1]
+            consumed = float(row[1] or 0) + delta["consumed"]
+            exported = float(row[2] or 0) + delta["exported"]
+            imported = float(row[3] or 0) + delta["imported"]
+            savings = float(row[4] or 0) + delta["savings"]
         else:
-            print(f"Error: Month {month_year} not found in month sheet.")
+            # New month, add it below the existing months
+            row_index = next_row
+            next_row += 1
+            consumed = delta["consumed"]
+            exported = delta["exported"]
+            imported = delta["imported"]
+            savings = delta["savings"]
 
-    print(Fore.GREEN + "Monthly worksheet updated successfully.\n")
+        updates.append({
+            "range": f"A{row_index}:E{row_index}",
+            "values": [[month_year, consumed, exported, imported, savings]]
+        })
 
-    time.sleep(3)
+    if updates:
+        # Not urgent, sent with the next batch of writes
+        CACHE.batch_update("monthly", updates, urgent=False)
+
+
+def check_monthly_worksheet():
+    """
+    Compare the monthly sheet with a full calculation from the daily data.
+    Returns a list of months whose totals do not agree.
+    """
+    # Compare against fresh sheet data rather than the local snapshot
+    REFRESH.wait()
+    CACHE.invalidate()
+    month_data = calculate_month()
+    month_rows = CACHE.get_all_values("monthly")[1:]
+
+    sheet_totals = {}
+    for row in month_rows:
+        totals = [float(value or 0) for value in row[1:5]]
+        sheet_totals[row[0].strip()] = totals
+
+    mismatched = []
+    for month_year, info in month_data.items():
+        expected = [
+            info["consumed"],
+            info["exported"],
+            info["imported"],
+            info["savings"]
+            ]
+        actual = sheet_totals.pop(month_year, None)
+        if actual is None or not all(
+                isclose(a, b, abs_tol=MONTHLY_TOLERANCE)
+                for a, b in zip(expected, actual)):
+            mismatched.append(month_year)
+
+    # Months in the sheet with no daily data behind them
+    mismatched.extend(sheet_totals)
+
+    return mismatched
 
 
 def calculate_project_payback():
     """
     Calculate project payback based on available data.
+    The project cost and installation date are saved, pressing Enter
+    keeps the saved values.
     """
-    monthly = SHEET.worksheet("monthly")
-    values = monthly.col_values(5)
-    new_values = values[1:]
-    nums_list = [float(value) for value in new_values]
-    month_savings = [num for num in nums_list]
-    total_months = sum(month_savings)
+    update_savings_series(CACHE.get_all_values("monthly")[1:])
+    saved_cost = PAYBACK.project_cost
 
     while True:
         print(Fore.BLUE + "Please enter project cost.\n")
         print("Format: Project Cost (€).\n")
         print("Example: 5000.00\n")
-        project_str = input("Enter your data here: \n")
+        if saved_cost is not None:
+            print(f"Press Enter to keep the saved cost of €{saved_cost}.\n")
+        project_str = ask("Enter your data here: \n")
+        if not project_str.strip() and saved_cost is not None:
+            project_str = str(saved_cost)
         data_project = project_str.split(",")
 
         # validate input project str
@@ -291,19 +1078,62 @@ def calculate_project_payback():
             print(Fore.GREEN + '\nProject data is valid.\n')
             break
 
+    installation_date = get_installation_date()
+
+    # Kept for the background payback refresh after new daily data
+    PAYBACK.set_project(float(project_str), installation_date)
+    FLEET.set_project_cost(SITE, float(project_str))
+
     print("Calculating project payback...\n")
 
-    payback = total_months - float(project_str)
+    payback = PAYBACK.payback_at(datetime.today().date())
+
+    break_even = PAYBACK.forecast_break_even()
+    if break_even is None:
+        print(Fore.RED + "Break-even: not reached within "
+              f"{FORECAST_MONTHS // 12} years at the current savings.\n")
+    elif break_even <= np.datetime64(datetime.today().date(), "M"):
+        print(Fore.GREEN + "Break-even: reached in "
+              f"{break_even.astype(object):%b %Y}.\n")
+    else:
+        print(Fore.BLUE + "Break-even forecast: "
+              f"{break_even.astype(object):%b %Y}.\n")
 
     return payback
 
 
+def get_installation_date():
+    """
+    Ask for the installation date, savings from before it are not
+    counted. Returns None to keep the saved date.
+    """
+    saved_date = PAYBACK.installation_date
+
+    while True:
+        print(Fore.BLUE + "Please enter installation date.\n")
+        print("Format: Day Month Year.\n")
+        print("Example: 3 Jun 2024\n")
+        if saved_date is None:
+            print("Press Enter to count every month of savings.\n")
+        else:
+            saved_day = saved_date.astype(object)
+            print("Press Enter to keep the saved date of "
+                  f"{saved_day.day} {saved_day:%b %Y}.\n")
+        date_str = ask("Enter your data here: \n").strip()
+        print()
+        if not date_str:
+            return None
+        try:
+            return parse_day(date_str)
+        except ValueError:
+            print(Fore.RED + f"Invalid date: {date_str}. "
+                  "Please use correct format.\n")
+
+
 def update_payback_worksheet(data):
     """
     Update payback worksheet.
     """
-    payback_worksheet = SHEET.worksheet("payback")
-
     payback_list = []
 
     print("Updating payback worksheet...\n")
@@ -311,15 +1141,18 @@ def update_payback_worksheet(data):
     # Update payback sheet
     payback_list.append(data)
     # credit: https://stackoverflow.com/questions/75731307/
-    payback_worksheet.update([[val] for val in payback_list], "A2")
+    CACHE.update("payback", [[val] for val in payback_list], "A2",
+                 urgent=False)
 
     print(Fore.GREEN + "Payback worksheet updated successfully.\n")
 
 
-def display_daily_data(data):
+def display_daily_data():
     """
-    Display daily data with a brief overview.
+    Display daily data one page at a time with a brief overview.
+    Only the rows of the page shown are read from the daily sheet.
     """
+    print_refresh_status()
     print(Fore.BLUE + "Here is your daily data:")
     print("Date: The date of your entered daily data.")
     print("Consumed (kW): The energy consumed during "
@@ -329,7 +1162,24 @@ def display_daily_data(data):
     print("Imported (kW): The energy imported from the grid "
           "during the day, in kilowatts.")
 
-    if len(data) > 1:
+    # Date of each row, the first data row is row 2 of the sheet
+    dates = [date.fromordinal(ordinal) if ordinal else None
+             for ordinal in day_ordinals(
+                 CACHE.col_values("daily", 1)[1:]).tolist()]
+
+    if not dates:
+        print(Fore.RED + "\nNo daily data available.\n")
+        return 'main_menu'
+
+    all_rows = list(range(2, len(dates) + 2))
+    shown_rows = all_rows
+    page = 0
+
+    while True:
+        pages = max(1, -(-len(shown_rows) // PAGE_ROWS))
+        page = min(page, pages - 1)
+        page_rows = shown_rows[page * PAGE_ROWS:(page + 1) * PAGE_ROWS]
+
         print("\n")  # Add a newline above the table
         table = prettytable.PrettyTable([
             "Date",
@@ -337,32 +1187,121 @@ def display_daily_data(data):
             "Exported (kW)",
             "Imported (kW)"
             ])
-        for row in data[1:]:
-            table.add_row(row)
+        if page_rows:
+            first_row = min(page_rows)
+            rows = CACHE.get_range("daily", first_row, max(page_rows), "D")
+            for row_number in page_rows:
+                table.add_row(rows[row_number - first_row])
         print(table)
+        print(f"Page {page + 1} of {pages}, "
+              f"{len(shown_rows)} of {len(all_rows)} days shown.")
         print()  # Add a single newline below the table
 
-        while True:
-            print(Fore.BLUE + "\nWhat would you like to do next?")
-            print("1. Back to main menu")
-            print("2. Exit")
-            choice = input("Enter your choice (1 or 2): \n")
-            print()
+        print(Fore.BLUE + "\nWhat would you like to do next?")
+        print("N. Next page")
+        print("P. Previous page")
+        print("M. Jump to month")
+        print("D. Show a date range")
+        print("A. Show all days")
+        print("1. Back to main menu")
+        print("2. Exit")
+        choice = ask("Enter your choice (N, P, M, D, A, 1 or 2): \n")
+        choice = choice.strip().upper()
+        print()
 
-            if choice == '1':
-                time.sleep(2)
-                return 'main_menu'
-            elif choice == '2':
-                time.sleep(2)
-                return 'exit'
+        if choice == 'N':
+            page += 1
+        elif choice == 'P':
+            page = max(0, page - 1)
+        elif choice == 'M':
+            month = get_month_choice()
+            matches = [index for index, row_number in enumerate(shown_rows)
+                       if dates[row_number - 2]
+                       and format_month(dates[row_number - 2]) == month]
+            if matches:
+                page = matches[0] // PAGE_ROWS
             else:
-                print(Fore.RED + "Invalid choice. Please enter either 1 or 2.")
+                print(Fore.RED + f"No daily data for {month}.\n")
+        elif choice == 'D':
+            start_date, end_date = get_date_range()
+            shown_rows = [row_number for row_number in all_rows
+                          if dates[row_number - 2]
+                          and start_date <= dates[row_number - 2] <= end_date]
+            page = 0
+        elif choice == 'A':
+            shown_rows = all_rows
+            page = 0
+        elif choice == '1':
+            pause(2)
+            return 'main_menu'
+        elif choice == '2':
+            pause(2)
+            return 'exit'
+        else:
+            print(Fore.RED + "Invalid choice. "
+                  "Please enter N, P, M, D, A, 1 or 2.")
+
+
+def get_month_choice():
+    """
+    Get a month year from the user, e.g. Jun 2024.
+    """
+    while True:
+        month_str = ask("Enter the month (e.g. Jun 2024): \n").strip()
+        print()
+        try:
+            return format_month(parse_month(month_str))
+        except ValueError:
+            print(Fore.RED + f"Invalid month, you provided {month_str}.\n")
+
+
+def get_date_range():
+    """
+    Get a start and end date from the user.
+    """
+    while True:
+        range_str = ask("Enter the date range "
+                        "(e.g. 1 Jun 2024 - 30 Jun 2024): \n")
+        print()
+        try:
+            start_str, end_str = range_str.split("-")
+            start_date = parse_day(start_str.strip())
+            end_date = parse_day(end_str.strip())
+        except ValueError:
+            print(Fore.RED + "Invalid date range, "
+                  f"you provided {range_str}.\n")
+            continue
+        return start_date, end_date
+
+
+def print_refresh_status():
+    """
+    Show a marker while daily data is waiting in the journal or the
+    monthly and payback totals are out of date.
+    """
+    waiting = len(JOURNAL.pending())
+    if waiting:
+        print(Fore.YELLOW + f"{waiting} daily entries saved locally are "
+              "waiting to be added to the daily worksheet.\n")
+
+    held = CACHE.pending_writes()
+    if held:
+        print(Fore.YELLOW + f"{held} monthly and payback changes are "
+              "waiting to be sent to Google Sheets.\n")
+
+    if REFRESH.error is not None:
+        print(Fore.RED + f"Refresh failed: {REFRESH.error}. "
+              "It will be retried with the next update.\n")
+    elif REFRESH.is_pending():
+        print(Fore.YELLOW + "Refresh pending: monthly and payback totals "
+              "are still being updated.\n")
 
 
 def display_month_data(data):
     """
     Display monthly data with a brief overview.
     """
+    print_refresh_status()
     print(Fore.BLUE + "Here is your monthly data:")
     print("Month Year: The month and year of energy data.")
     print("Consumed (kW): The energy consumed during "
@@ -391,14 +1330,14 @@ def display_month_data(data):
             print(Fore.BLUE + "\nWhat would you like to do next?")
             print("1. Back to main menu")
             print("2. Exit")
-            choice = input("Enter your choice (1 or 2): \n")
+            choice = ask("Enter your choice (1 or 2): \n")
             print()
 
             if choice == '1':
-                time.sleep(2)
+                pause(2)
                 return 'main_menu'
             elif choice == '2':
-                time.sleep(2)
+                pause(2)
                 return 'exit'
             else:
                 print(Fore.RED + "Invalid choice. Please enter either 1 or 2.")
@@ -411,7 +1350,8 @@ def display_project_data(data):
     """
     Display project data with a brief overview.
     """
-    time.sleep(5)
+    pause(5)
+    print_refresh_status()
     print(Fore.BLUE + "Here is your project data:")
     print("Payback (€): The balance of your project data, in euros.")
 
@@ -449,14 +1389,14 @@ def display_project_data(data):
             print(Fore.BLUE + "\nWhat would you like to do next?")
             print("1. Back to main menu")
             print("2. Exit")
-            choice = input("Enter your choice (1 or 2): \n")
+            choice = ask("Enter your choice (1 or 2): \n")
             print()
 
             if choice == '1':
-                time.sleep(2)
+                pause(2)
                 return 'main_menu'
             elif choice == '2':
-                time.sleep(2)
+                pause(2)
                 return 'exit'
             else:
                 print(Fore.RED + "Invalid choice. Please enter either 1 or 2.")
@@ -465,16 +1405,176 @@ def display_project_data(data):
         return 'main_menu'
 
 
+def site_cache(site):
+    """
+    Return the local cache of site, opening its google sheet on first use.
+    """
+    if site == SITE:
+        return CACHE
+
+    opened = []
+
+    def open_site():
+        if not opened:
+            opened.append(connect_spreadsheet(SITES[site]))
+        return opened[0]
+
+    return SheetCache(open_site, path=site_path(site, CACHE_FILE),
+                      gateway=GATEWAY)
+
+
+def rebuild_fleet_data():
+    """
+    Recalculate the monthly totals of every site from its daily data.
+    """
+    print(f"Reading daily data of {len(SITES)} sites...\n")
+    daily_rows = {}
+    for site in SITES:
+        daily_rows[site] = site_cache(site).get_all_values("daily")[1:]
+
+    print("Calculating fleet data...\n")
+    FLEET.rebuild(TARIFF, daily_rows)
+
+
+def stats_row(label, totals):
+    """
+    Return a statistics table row of a period's totals and ratios.
+    """
+    self_consumed, self_consumption, independence = energy_ratios(totals)
+    return ([label] + [round(float(value), 2) for value in totals]
+            + ["-" if ratio is None else f"{ratio:.0%}"
+               for ratio in (self_consumption, independence)])
+
+
+def display_stats_data():
+    """
+    Display the totals of the last 7, 30 and 365 days and of each year,
+    with the self-consumption and grid independence.
+    """
+    STATS.reload_if_changed()
+    # Build the statistics again if the daily sheet changed other than
+    # by the days added or updated in the app, e.g. edited in the sheet
+    if CACHE.get_meta(STATS_VERSION) != CACHE.version("daily"):
+        rebuild_stats()
+
+    print_refresh_status()
+    print(Fore.BLUE + "Here are your energy statistics:")
+    print("Consumed, Exported, Imported: The totals of the period, "
+          "in kilowatts.")
+    print("Self-use: The share of the solar energy generated that was "
+          "used at home,\nthe energy consumed less the energy imported.")
+    print("Independence: The share of the energy consumed that was not "
+          "imported.")
+
+    last_day = STATS.last_day()
+    if last_day is None:
+        print(Fore.RED + "\nNo daily data available.\n")
+        return 'main_menu'
+
+    print("\n")  # Add a newline above the table
+    table = prettytable.PrettyTable([
+        "Period",
+        "Consumed",
+        "Exported",
+        "Imported",
+        "Self-use",
+        "Independence"
+        ])
+    for days in WINDOW_DAYS:
+        table.add_row(stats_row(f"Last {days} days", STATS.window(days)))
+    for year, totals in STATS.years().items():
+        table.add_row(stats_row(str(year), totals))
+    print(table)
+    print(f"The last days run up to {format_day(last_day)}, the last day "
+          "with data.\n")
+
+    while True:
+        print(Fore.BLUE + "\nWhat would you like to do next?")
+        print("1. Back to main menu")
+        print("2. Exit")
+        choice = ask("Enter your choice (1 or 2): \n")
+        print()
+
+        if choice == '1':
+            pause(2)
+            return 'main_menu'
+        elif choice == '2':
+            pause(2)
+            return 'exit'
+        else:
+            print(Fore.RED + "Invalid choice. Please enter either 1 or 2.")
+
+
+def display_fleet_data():
+    """
+    Display the totals of every site with a fleet total.
+    """
+    while True:
+        rows = FLEET.summary()
+
+        print(Fore.BLUE + "Here is your fleet data:")
+        print("Site: The household the solar system is installed at.")
+        print("Months: The number of months with energy data.")
+        print("Consumed, Exported, Imported (kW) and Savings (€): "
+              "The totals of every month.")
+        print("Payback (€): Savings less the project cost entered.")
+
+        if rows:
+            print("\n")  # Add a newline above the table
+            table = prettytable.PrettyTable([
+                "Site",
+                "Months",
+                "Consumed (kW)",
+                "Exported (kW)",
+                "Imported (kW)",
+                "Savings (€)",
+                "Payback (€)"
+                ])
+            for row in rows:
+                table.add_row([row[0], row[1]]
+                              + [round(value, 2) for value in row[2:6]]
+                              + ["-" if row[6] is None
+                                 else round(row[6], 2)])
+            table.add_row(["Fleet", sum(row[1] for row in rows)]
+                          + [round(sum(row[index] for row in rows), 2)
+                             for index in range(2, 6)] + [""])
+            print(table)
+            print()  # Add a single newline below the table
+        else:
+            print(Fore.RED + "\nNo fleet data available.\n")
+
+        print(Fore.BLUE + "\nWhat would you like to do next?")
+        print("1. Back to main menu")
+        print("2. Exit")
+        print("3. Recalculate every site from its daily data")
+        choice = ask("Enter your choice (1, 2 or 3): \n")
+        print()
+
+        if choice == '1':
+            pause(2)
+            return 'main_menu'
+        elif choice == '2':
+            pause(2)
+            return 'exit'
+        elif choice == '3':
+            rebuild_fleet_data()
+        else:
+            print(Fore.RED + "Invalid choice. Please enter 1, 2 or 3.")
+
+
 def print_menu():
     """
     Print the main menu options.
     """
     print(Fore.BLUE + "Main Menu:")
     print("1. Enter daily data")
-    print("2. View daily data")
-    print("3. View monthly data")
-    print("4. Enter and View project payback")
-    print("5. Exit")
+    print("2. Import daily data file")
+    print("3. View daily data")
+    print("4. View monthly data")
+    print("5. Enter and View project payback")
+    print("6. View statistics")
+    print("7. View fleet summary")
+    print("8. Exit")
 
 
 def main():
@@ -489,53 +1589,454 @@ def main():
           "savings and payback on the installed system.\n")
 
     while True:
-        print_menu()
-        choice = input("\nEnter your choice (1, 2, 3, 4 or 5): \n")
-        print()
+        with PROFILER.action("Main menu"):
+            # Send held sheet writes while the request budget has room
+            CACHE.flush(wait=False)
+            # Retry daily data left in the journal, e.g. while offline
+            if JOURNAL.pending():
+                REFRESH.submit("sync")
+            print_menu()
+            choice = ask("\nEnter your choice "
+                         "(1, 2, 3, 4, 5, 6, 7 or 8): \n")
+            print()
 
-        if choice == '1':
-            daily_energy_data = get_daily_data()
-            str_list = daily_energy_data[1:]
-            num_list = [float(value) for value in str_list]
-            new_daily_list = []
-            new_daily_list.append(daily_energy_data[0])
-            new_daily_list.extend(num_list)
-            update_daily_worksheet(new_daily_list)
-            update_monthly_worksheet()
+        with PROFILER.action(MENU_ACTIONS.get(choice, "Invalid choice")):
+            if choice == '1':
+                daily_energy_data = get_daily_data()
+                str_list = daily_energy_data[1:]
+                num_list = [float(value) for value in str_list]
+                new_daily_list = []
+                new_daily_list.append(daily_energy_data[0])
+                new_daily_list.extend(num_list)
+                update_daily_worksheet(new_daily_list)
 
-        elif choice == '2':
-            daily_data = SHEET.worksheet("daily").get_all_values()
-            action = display_daily_data(daily_data)
-            if action == 'exit':
-                print("Exiting the Solar System Data Automation App. Goodbye!")
-                time.sleep(2)
+            elif choice == '2':
+                import_daily_data(get_import_path())
+                pause(3)
+
+            elif choice == '3':
+                action = display_daily_data()
+                if action == 'exit':
+                    print("Exiting the Solar System Data Automation App. "
+                          "Goodbye!")
+                    pause(2)
+                    break
+
+            elif choice == '4':
+                month_data = CACHE.get_all_values("monthly")
+                action = display_month_data(month_data)
+                if action == 'exit':
+                    print("Exiting the Solar System Data Automation App. "
+                          "Goodbye!")
+                    pause(2)
+                    break
+
+            elif choice == '5':
+                project_data = calculate_project_payback()
+                update_payback_worksheet(project_data)
+                action = display_project_data(project_data)
+                if action == 'exit':
+                    print("Exiting the Solar System Data Automation App. "
+                          "Goodbye!")
+                    pause(2)
+                    break
+
+            elif choice == '6':
+                action = display_stats_data()
+                if action == 'exit':
+                    print("Exiting the Solar System Data Automation App. "
+                          "Goodbye!")
+                    pause(2)
+                    break
+
+            elif choice == '7':
+                action = display_fleet_data()
+                if action == 'exit':
+                    print("Exiting the Solar System Data Automation App. "
+                          "Goodbye!")
+                    pause(2)
+                    break
+
+            elif choice == '8':
+                print("Exiting the Solar System Data Automation App. "
+                      "Goodbye!")
+                pause(2)
                 break
 
-        elif choice == '3':
-            month_data = SHEET.worksheet("monthly").get_all_values()
-            action = display_month_data(month_data)
-            if action == 'exit':
-                print("Exiting the Solar System Data Automation App. Goodbye!")
-                time.sleep(2)
-                break
+            else:
+                print(Fore.RED + "Invalid choice. "
+                      "Please choose 1, 2, 3, 4, 5, 6, 7 or 8.")
 
-        elif choice == '4':
-            project_data = calculate_project_payback()
-            update_payback_worksheet(project_data)
-            action = display_project_data(project_data)
-            if action == 'exit':
-                print("Exiting the Solar System Data Automation App. Goodbye!")
-                time.sleep(2)
-                break
 
-        elif choice == '5':
-            print("Exiting the Solar System Data Automation App. Goodbye!")
-            time.sleep(2)
-            break
+def date_argument(value):
+    """
+    Read a Day Month Year or Month Year command line date.
+    """
+    try:
+        return parse_date(value.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid date {value!r}, use e.g. 3 Jun 2024") from None
+
 
+def build_parser():
+    """
+    Build the parser of the command line options and commands.
+    """
+    # --json is accepted before or after the command
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--json", action="store_true",
+                        default=argparse.SUPPRESS,
+                        help="print the command result as JSON")
+
+    parser = argparse.ArgumentParser(
+        prog="run.py",
+        description="Solar System Data Automation. Without a command the "
+        "main menu is shown.")
+    parser.add_argument("--json", action="store_true",
+                        help="print the command result as JSON")
+    parser.add_argument("--site", help="site of the sites file to use")
+    parser.add_argument("--pooled", action="store_true",
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--profile", action="store_true",
+                        help="report the time of each action at exit")
+    parser.add_argument("--profile-trace", metavar="FILE",
+                        help="also save it as a Chrome trace-event file")
+    parser.add_argument("--no-splash", action="store_true",
+                        help="skip the opening screen")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    add = commands.add_parser(
+        "add", parents=[output], help="add daily data")
+    add.add_argument("entries", nargs="+", metavar="ENTRY",
+                     help="daily data, e.g. \"3 Jun 2024, 5.154, 20.698, "
+                     "6.354\", or - to read one entry per line from stdin")
+
+    import_files = commands.add_parser(
+        "import", parents=[output], help="import daily data files")
+    import_files.add_argument("paths", nargs="+", metavar="FILE")
+
+    recompute = commands.add_parser(
+        "recompute", parents=[output],
+        help="rebuild the monthly worksheet from the daily data")
+    recompute.add_argument("--check", action="store_true",
+                           help="only list the months that do not agree")
+
+    show = commands.add_parser(
+        "show", parents=[output], help="show daily, monthly or payback data")
+    show.add_argument("sheet", choices=["daily", "monthly", "payback"])
+    show.add_argument("--from", dest="start", type=date_argument,
+                      metavar="DATE", help="first date, e.g. 1 Jun 2024")
+    show.add_argument("--to", dest="end", type=date_argument,
+                      metavar="DATE", help="last date, e.g. 30 Jun 2024")
+
+    payback = commands.add_parser(
+        "payback", parents=[output], help="calculate the project payback")
+    payback.add_argument("--cost", type=float,
+                         help="project cost in euros, saved for next time")
+    payback.add_argument("--installed", type=date_argument, metavar="DATE",
+                         help="installation date, saved for next time")
+
+    commands.add_parser(
+        "export", parents=[output],
+        help="save the daily, monthly and payback data as a typed "
+        "columnar snapshot")
+
+    return parser
+
+
+def command_add(options):
+    """
+    Validate and save daily entries. Nothing is saved if any entry is
+    invalid.
+    """
+    entries = []
+    for entry in options.entries:
+        if entry == "-":
+            entries.extend(line for line in sys.stdin if line.strip())
+        else:
+            entries.append(entry)
+
+    batch_dates = set()
+    rows = []
+    errors = []
+    for entry in entries:
+        values = split_daily_data(entry.strip())
+        problems = check_daily_data(values, batch_dates)
+        if problems:
+            errors.append({"entry": entry.strip(),
+                           "error": problems[0].strip()})
         else:
-            print(Fore.RED + "Invalid choice. Please choose 1, 2, 3, 4 or 5.")
+            rows.append([values[0].strip()]
+                        + [float(value) for value in values[1:]])
 
+    if errors:
+        for error in errors:
+            print(Fore.RED + f"{error['entry']}: {error['error']}",
+                  file=sys.stderr)
+        return EXIT_INVALID, {"added": 0, "errors": errors}
 
-prog_start()
-main()
+    save_daily_rows(rows)
+    print(Fore.GREEN + f"{len(rows)} daily entries saved.")
+    return EXIT_OK, {"added": len(rows), "errors": []}
+
+
+def command_import(options):
+    """
+    Import daily data files, reporting the lines rejected.
+    """
+    code = EXIT_OK
+    files = []
+    for path in options.paths:
+        if not os.path.isfile(path):
+            print(Fore.RED + f"File not found, you provided {path}.",
+                  file=sys.stderr)
+            files.append({"path": path, "error": "File not found"})
+            code = EXIT_INVALID
+            continue
+
+        imported_count, rejects = import_daily_data(path)
+        files.append({"path": path, "imported": imported_count,
+                      "rejected": len(rejects)})
+        if rejects:
+            code = EXIT_INVALID
+
+    return code, {"files": files}
+
+
+def command_recompute(options):
+    """
+    Rebuild the monthly worksheet, or with --check list the months that
+    do not agree with the daily data.
+    """
+    if options.check:
+        mismatched = check_monthly_worksheet()
+        for month_year in mismatched:
+            print(Fore.RED + f"{month_year} does not agree with the "
+                  "daily data.")
+        if not mismatched:
+            print(Fore.GREEN + "Monthly worksheet agrees with the daily data.")
+        return (EXIT_INVALID if mismatched else EXIT_OK,
+                {"mismatched": mismatched})
+
+    api_calls = update_monthly_worksheet()
+    REFRESH.submit("payback")
+    months = len(CACHE.get_all_values("monthly")) - 1
+    return EXIT_OK, {"months": months, "api_calls": api_calls}
+
+
+def command_show(options):
+    """
+    Print the daily or monthly rows between --from and --to, or the
+    payback.
+    """
+    # Include the daily data still being sent to the sheets
+    REFRESH.wait()
+    if options.sheet == "payback":
+        update_savings_series(CACHE.get_all_values("monthly")[1:])
+        return EXIT_OK, payback_summary()
+
+    rows = CACHE.get_all_values(options.sheet)
+    header, rows = rows[0], rows[1:]
+    if options.sheet == "daily":
+        ordinals = day_ordinals([row[0] for row in rows]).tolist()
+        start = options.start.toordinal() if options.start else 1
+        end = options.end.toordinal() if options.end else date.max.toordinal()
+        rows = [row for row, ordinal in zip(rows, ordinals)
+                if ordinal and start <= ordinal <= end]
+    else:
+        start = options.start.replace(day=1) if options.start else date.min
+        end = options.end or date.max
+        shown = []
+        for row in rows:
+            try:
+                month = parse_month(row[0].strip())
+            except ValueError:
+                continue
+            if start <= month <= end:
+                shown.append(row)
+        rows = shown
+
+    names = [name.split(" (")[0].lower().replace(" ", "_")
+             for name in header]
+    results = []
+    for row in rows:
+        try:
+            values = [float(value or 0) for value in row[1:len(names)]]
+        except ValueError:
+            error = (f"{options.sheet.capitalize()} row {row[0]} has a "
+                     f"value that is not a number: {', '.join(row)}")
+            print(Fore.RED + error, file=sys.stderr)
+            return EXIT_INVALID, {"error": error}
+        results.append(dict(zip(names, [row[0]] + values)))
+
+    table = prettytable.PrettyTable(header)
+    table.add_rows(rows)
+    print(table)
+
+    return EXIT_OK, {"rows": results}
+
+
+def command_payback(options):
+    """
+    Calculate the payback with the saved or given project cost and
+    installation date, and update the payback worksheet.
+    """
+    project_cost = options.cost
+    if project_cost is None:
+        project_cost = PAYBACK.project_cost
+    if project_cost is None:
+        print(Fore.RED + "No project cost saved, give one with --cost.",
+              file=sys.stderr)
+        return EXIT_INVALID, {"error": "No project cost saved"}
+
+    update_savings_series(CACHE.get_all_values("monthly")[1:])
+    PAYBACK.set_project(project_cost, options.installed)
+    FLEET.set_project_cost(SITE, project_cost)
+
+    update_payback_worksheet(PAYBACK.payback_at(datetime.today().date()))
+    return EXIT_OK, payback_summary()
+
+
+def payback_summary():
+    """
+    Print and return the saved project, the savings and payback to date
+    and the break-even month.
+    """
+    today = datetime.today().date()
+    payback = PAYBACK.payback_at(today)
+    break_even = PAYBACK.forecast_break_even()
+    break_even = (format_month(break_even.astype(object))
+                  if break_even is not None else None)
+    installation_date = PAYBACK.installation_date
+    savings = PAYBACK.savings_to(today)
+
+    print(f"Savings (€): {savings:.2f}")
+    if payback is not None:
+        print(f"Payback (€): {payback:.2f}")
+        print(f"Break-even: {break_even or 'not forecast'}")
+    return {
+        "project_cost": PAYBACK.project_cost,
+        "installation_date": (format_day(installation_date.astype(object))
+                              if installation_date is not None else None),
+        "savings": savings,
+        "payback": payback,
+        "break_even": break_even
+    }
+
+
+def command_export(options):
+    """
+    Bring the snapshot up to date with the sheets, appending new days.
+    """
+    # Include the daily data still being sent to the sheets
+    REFRESH.wait()
+    tables = export_snapshot()
+    for table, info in tables.items():
+        print(f"{table}: {info['rows']} rows, {info['written']} written, "
+              f"{info['rejected']} rejected.")
+    print(Fore.GREEN + f"Snapshot saved to {SNAPSHOT.path}.")
+    code = (EXIT_INVALID if any(info["rejected"] for info in tables.values())
+            else EXIT_OK)
+    return code, {"path": SNAPSHOT.path, "tables": tables}
+
+
+# const for function of each command
+COMMANDS = {
+    "add": command_add,
+    "import": command_import,
+    "recompute": command_recompute,
+    "show": command_show,
+    "payback": command_payback,
+    "export": command_export
+}
+
+
+def run_command(options):
+    """
+    Run a command without the menu, splash screen or pauses, and wait
+    for the sheets to be updated. Returns the exit code: 0 on success,
+    1 for invalid input and 3 when Google Sheets could not be updated.
+    With --json the result is printed as JSON and the progress messages
+    go to stderr.
+    """
+    global SCRIPTED
+
+    SCRIPTED = True
+    messages = (contextlib.redirect_stdout(sys.stderr) if options.json
+                else contextlib.nullcontext())
+    with messages:
+        with PROFILER.action(f"Command {options.command}"):
+            try:
+                # Retry daily data left in the journal, e.g. while offline
+                if JOURNAL.pending():
+                    REFRESH.submit("sync")
+                code, result = COMMANDS[options.command](options)
+                REFRESH.wait()
+                CACHE.flush()
+            except (GSpreadException, GoogleAuthError, OSError) as e:
+                print(Fore.RED + f"Could not reach Google Sheets: {e}",
+                      file=sys.stderr)
+                code, result = EXIT_SHEETS, {"error": str(e)}
+
+        pending = len(JOURNAL.pending())
+        if pending:
+            print(Fore.YELLOW + f"{pending} daily entries are saved locally "
+                  "and added to the daily worksheet the next time the app "
+                  "runs.", file=sys.stderr)
+            result["pending"] = pending
+        elif REFRESH.error is not None:
+            print(Fore.RED + "Could not update Google Sheets: "
+                  f"{REFRESH.error}", file=sys.stderr)
+            result["error"] = str(REFRESH.error)
+        if (pending or REFRESH.error is not None) and code == EXIT_OK:
+            code = EXIT_SHEETS
+
+        if PROFILER.enabled:
+            PROFILER.report(GATEWAY.counters())
+
+    if options.json:
+        print(json.dumps(result))
+    return code
+
+
+if __name__ == "__main__":
+    options = build_parser().parse_args()
+    # --profile reports the time of each menu action at exit,
+    # --profile-trace FILE also saves it as a Chrome trace-event file
+    if options.profile or options.profile_trace:
+        PROFILER.enabled = True
+    if options.command:
+        exit_code = run_command(options)
+        if options.profile_trace:
+            PROFILER.write_trace(options.profile_trace)
+        sys.exit(exit_code)
+
+    # --pooled starts a warm worker for the terminal server pool
+    if options.pooled:
+        wait_for_claim()
+    # --no-splash skips the opening screen
+    if not options.no_splash:
+        with PROFILER.action("Opening screen"):
+            prog_start()
+    try:
+        main()
+    finally:
+        # Finish background refreshes and send any sheet writes still
+        # held, also when the session ends with an error
+        with PROFILER.action("Closing"):
+            REFRESH.wait()
+            try:
+                CACHE.flush()
+            except (GSpreadException, GoogleAuthError, OSError) as e:
+                print(Fore.RED + f"Could not update Google Sheets: {e}")
+                print(Fore.YELLOW + "The changes are saved locally and sent "
+                      "the next time the app is started.")
+    if JOURNAL.pending():
+        print(Fore.YELLOW + "Daily data saved locally is added to the "
+              "daily worksheet the next time the app is started.")
+    if PROFILER.enabled:
+        PROFILER.report(GATEWAY.counters())
+    if options.profile_trace:
+        PROFILER.write_trace(options.profile_trace)
+        print(f"Profile trace saved to {options.profile_trace}")
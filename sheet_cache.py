@@ -0,0 +1,445 @@
+# Local write-through cache of the solar_system worksheets, kept in a
+# SQLite snapshot on disk
+
+# functools library to wrap the methods that hold the cache lock
+import functools
+
+# json library to store rows in the snapshot
+import json
+
+# sqlite3 library for the on-disk snapshot
+import sqlite3
+
+# threading library to share the cache with the refresh worker
+import threading
+
+# time library to limit how often the sheet is revalidated
+import time
+
+# uuid library to mark each change of the cached rows
+import uuid
+
+# a1_to_rowcol to apply range writes to the local snapshot
+from gspread.utils import a1_to_rowcol
+
+# gateway every Sheets API call goes through
+from sheets_gateway import SheetsGateway
+
+# const for untracked cache file
+CACHE_FILE = "solar_cache.sqlite3"
+
+# seconds a validated snapshot is trusted before checking the sheet again
+REVALIDATE_SECONDS = 30
+
+
+def cell_text(value):
+    """
+    Convert a written value to the text Google Sheets displays for it.
+    """
+    if isinstance(value, float):
+        return f"{value:.10g}"
+    return str(value)
+
+
+def locked(method):
+    """
+    Run a cache method holding the cache lock, so the menu and the
+    background refresh worker do not interleave their reads and writes.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SheetCache:
+    """
+    Cache of worksheet rows kept in a SQLite snapshot on disk.
+
+    Reads are served from the snapshot while the spreadsheet's last
+    update time is unchanged, writes go to the sheet and the snapshot.
+    open_spreadsheet is called the first time the sheet is needed.
+
+    Every Sheets API call goes through gateway. Writes that are not
+    urgent are held as pending ranges in the snapshot, so they survive
+    a crash, and are sent together by flush.
+    """
+
+    def __init__(self, open_spreadsheet, path=CACHE_FILE,
+                 revalidate_seconds=REVALIDATE_SECONDS, gateway=None):
+        self.open_spreadsheet = open_spreadsheet
+        self.revalidate_seconds = revalidate_seconds
+        self.gateway = gateway or SheetsGateway()
+        self.checked_at = None
+        self.worksheets = {}
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=10,
+                                    check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rows (
+                sheet TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                cells TEXT NOT NULL,
+                PRIMARY KEY (sheet, position)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS held_writes (
+                sheet TEXT NOT NULL,
+                range_name TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                cells TEXT NOT NULL,
+                PRIMARY KEY (sheet, range_name)
+            );
+        """)
+
+    @property
+    def api_calls(self):
+        """
+        Number of Sheets API calls made so far.
+        """
+        return self.gateway.calls
+
+    @locked
+    def worksheet(self, name):
+        """
+        Return the worksheet handle for name, fetched once per session.
+        """
+        if name not in self.worksheets:
+            spreadsheet = self.open_spreadsheet()
+            self.worksheets[name] = self.gateway.call(
+                spreadsheet.worksheet, name)
+        return self.worksheets[name]
+
+    @locked
+    def get_meta(self, key):
+        """
+        Return a stored snapshot setting, or None if it is not set.
+        """
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @locked
+    def set_meta(self, key, value):
+        """
+        Store a snapshot setting.
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, value))
+
+    def last_update_time(self):
+        """
+        Fetch the spreadsheet last update time from Google Drive.
+        """
+        return self.gateway.call(self.open_spreadsheet().get_lastUpdateTime)
+
+    @locked
+    def revalidate(self, force=False):
+        """
+        Drop the snapshot if the spreadsheet changed since it was taken.
+        Pending writes are sent first so they are not lost from it.
+        Unless force is set, a recent check is trusted.
+        """
+        now = time.monotonic()
+        if (not force and self.checked_at is not None
+                and now - self.checked_at < self.revalidate_seconds):
+            return
+
+        self.flush()
+
+        stamp = self.last_update_time()
+        self.checked_at = now
+        if stamp != self.get_meta("last_update"):
+            self.clear()
+            self.set_meta("last_update", stamp)
+
+    @locked
+    def clear(self):
+        """
+        Remove every cached row so the next read fetches from the sheet.
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM rows")
+            self.conn.execute("DELETE FROM meta WHERE key LIKE 'loaded:%'")
+            self.conn.execute("DELETE FROM meta WHERE key LIKE 'version:%'")
+
+    @locked
+    def invalidate(self):
+        """
+        Force the next read to fetch fresh data from the sheet.
+        """
+        self.clear()
+        self.checked_at = None
+
+    def is_loaded(self, name):
+        """
+        Check if the snapshot holds the rows of worksheet name.
+        """
+        return self.get_meta(f"loaded:{name}") is not None
+
+    @locked
+    def load(self, name):
+        """
+        Fetch every row of worksheet name into the snapshot.
+        """
+        self.flush(names=[name])
+        worksheet = self.worksheet(name)
+        values = self.gateway.call(worksheet.get_all_values)
+        with self.conn:
+            self.conn.execute("DELETE FROM rows WHERE sheet = ?", (name,))
+            self.conn.executemany(
+                "INSERT INTO rows (sheet, position, cells) VALUES (?, ?, ?)",
+                [(name, position, json.dumps(row))
+                 for position, row in enumerate(values, start=1)])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (f"loaded:{name}", "1"))
+            self.mark_changed(name)
+
+    def mark_changed(self, name):
+        """
+        Give the cached rows of worksheet name a new version.
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (f"version:{name}", uuid.uuid4().hex))
+
+    def local_version(self, name):
+        """
+        Return the version of the cached rows of worksheet name without
+        checking the sheet, or None if they are not cached.
+        """
+        return self.get_meta(f"version:{name}")
+
+    @locked
+    def version(self, name):
+        """
+        Return the version of the rows of worksheet name, which changes
+        whenever they are fetched or written. Copies made from the rows
+        can be checked against it instead of comparing every row.
+        """
+        self.revalidate()
+        if not self.is_loaded(name):
+            self.load(name)
+        return self.get_meta(f"version:{name}")
+
+    @locked
+    def get_all_values(self, name):
+        """
+        Return every row of worksheet name as lists of strings.
+        """
+        self.revalidate()
+        if not self.is_loaded(name):
+            self.load(name)
+
+        stored = self.conn.execute(
+            "SELECT position, cells FROM rows WHERE sheet = ? "
+            "ORDER BY position", (name,)).fetchall()
+
+        # Fill gaps and pad rows the way get_all_values does
+        rows = []
+        for position, cells in stored:
+            while len(rows) < position - 1:
+                rows.append([])
+            rows.append(json.loads(cells))
+        width = max((len(row) for row in rows), default=0)
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    @locked
+    def col_values(self, name, col):
+        """
+        Return the values of column col (starting at 1) of worksheet name.
+        Only the column is fetched if the snapshot does not hold the sheet.
+        """
+        self.revalidate()
+        if not self.is_loaded(name):
+            self.flush(names=[name])
+            worksheet = self.worksheet(name)
+            return self.gateway.call(worksheet.col_values, col)
+
+        values = [row[col - 1] for row in self.get_all_values(name)]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    @locked
+    def get_range(self, name, start_row, end_row, last_col):
+        """
+        Return rows start_row to end_row of worksheet name, from column A
+        to last_col. Only the range is fetched if the snapshot does not
+        hold the sheet.
+        """
+        self.revalidate()
+        if self.is_loaded(name):
+            stored = self.conn.execute(
+                "SELECT position, cells FROM rows WHERE sheet = ? "
+                "AND position BETWEEN ? AND ?",
+                (name, start_row, end_row)).fetchall()
+            cells_by_row = {position: json.loads(cells)
+                            for position, cells in stored}
+        else:
+            self.flush(names=[name])
+            worksheet = self.worksheet(name)
+            values = self.gateway.call(
+                worksheet.get, f"A{start_row}:{last_col}{end_row}")
+            cells_by_row = dict(enumerate(values, start=start_row))
+
+        # Pad to the full range, trailing empty cells are not returned
+        width = a1_to_rowcol(f"{last_col}1")[1]
+        rows = []
+        for position in range(start_row, end_row + 1):
+            cells = cells_by_row.get(position, [])[:width]
+            rows.append(cells + [""] * (width - len(cells)))
+        return rows
+
+    def write_local(self, name, values, range_name):
+        """
+        Apply a range write to the cached rows of worksheet name.
+        """
+        start_row, start_col = a1_to_rowcol(range_name.split(":")[0])
+        for offset, new_cells in enumerate(values):
+            position = start_row + offset
+            stored = self.conn.execute(
+                "SELECT cells FROM rows WHERE sheet = ? AND position = ?",
+                (name, position)).fetchone()
+            cells = json.loads(stored[0]) if stored else []
+            end_col = start_col - 1 + len(new_cells)
+            if len(cells) < end_col:
+                cells.extend([""] * (end_col - len(cells)))
+            cells[start_col - 1:end_col] = [cell_text(v) for v in new_cells]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO rows (sheet, position, cells) "
+                "VALUES (?, ?, ?)", (name, position, json.dumps(cells)))
+        self.mark_changed(name)
+
+    def send_write(self, name, method, *args, apply_local=None):
+        """
+        Call write method of worksheet name with args, then apply it to
+        the snapshot with apply_local if it holds name.
+
+        The spreadsheet last update time is fetched before the write. If
+        it is the time the snapshot was taken, no other session has
+        changed the spreadsheet since and the snapshot stays in step.
+        Otherwise the snapshot is dropped. The time after the write is
+        not fetched, it could include a change by another session made
+        after this write, so the next check reloads the snapshot.
+        """
+        stamp = self.last_update_time()
+        self.gateway.call(getattr(self.worksheet(name), method), *args)
+        if stamp != self.get_meta("last_update"):
+            self.clear()
+            self.set_meta("last_update", stamp)
+        elif apply_local is not None and self.is_loaded(name):
+            with self.conn:
+                apply_local()
+
+    @locked
+    def append_row(self, name, row):
+        """
+        Append row to worksheet name and to the snapshot.
+        """
+        self.flush(names=[name])
+
+        def apply_local():
+            position = self.conn.execute(
+                "SELECT COALESCE(MAX(position), 0) + 1 FROM rows "
+                "WHERE sheet = ?", (name,)).fetchone()[0]
+            self.write_local(name, [row], f"A{position}")
+
+        self.send_write(name, "append_row", row, apply_local=apply_local)
+
+    @locked
+    def append_rows(self, name, rows):
+        """
+        Append several rows to worksheet name and to the snapshot.
+        """
+        self.flush(names=[name])
+
+        def apply_local():
+            position = self.conn.execute(
+                "SELECT COALESCE(MAX(position), 0) + 1 FROM rows "
+                "WHERE sheet = ?", (name,)).fetchone()[0]
+            self.write_local(name, rows, f"A{position}")
+
+        self.send_write(name, "append_rows", rows, apply_local=apply_local)
+
+    @locked
+    def update(self, name, values, range_name, urgent=True):
+        """
+        Write values to range_name of worksheet name and the snapshot.
+        A write that is not urgent is held until the next flush.
+        """
+        self.batch_update(
+            name, [{"range": range_name, "values": values}], urgent)
+
+    @locked
+    def batch_update(self, name, data, urgent=True):
+        """
+        Write several ranges of worksheet name and the snapshot.
+        A write that is not urgent is held until the next flush.
+        """
+        def apply_local():
+            for item in data:
+                self.write_local(name, item["values"], item["range"])
+
+        if not urgent:
+            # Held in the same transaction as the local change, so the
+            # snapshot never has a change the sheet will not get
+            with self.conn:
+                if self.is_loaded(name):
+                    apply_local()
+                seq = self.conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM held_writes"
+                    ).fetchone()[0]
+                # A later write to the same range replaces the held one
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO held_writes "
+                    "(sheet, range_name, seq, cells) VALUES (?, ?, ?, ?)",
+                    [(name, item["range"], seq + offset,
+                      json.dumps(item["values"]))
+                     for offset, item in enumerate(data, start=1)])
+            return
+
+        # Earlier held writes go first so they cannot overwrite this one
+        self.flush(names=[name])
+        self.send_write(name, "batch_update", data, apply_local=apply_local)
+
+    @locked
+    def pending_writes(self):
+        """
+        Return the number of ranges waiting to be written to the sheet.
+        """
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM held_writes").fetchone()[0]
+
+    @locked
+    def flush(self, wait=True, names=None):
+        """
+        Send the pending writes of worksheets names (default all), one
+        batch per worksheet. Unless wait is set, stop at the first
+        worksheet the request budget has no room for and leave it pending.
+        """
+        held = self.conn.execute(
+            "SELECT DISTINCT sheet FROM held_writes").fetchall()
+        for name in [name for (name,) in held
+                     if names is None or name in names]:
+            if not wait and self.gateway.wait_time():
+                return
+            stored = self.conn.execute(
+                "SELECT range_name, seq, cells FROM held_writes "
+                "WHERE sheet = ? ORDER BY seq", (name,)).fetchall()
+            data = [{"range": range_name, "values": json.loads(cells)}
+                    for range_name, seq, cells in stored]
+            # Already applied to the snapshot when they were held
+            self.send_write(name, "batch_update", data)
+            with self.conn:
+                # Ranges held again while sending stay held
+                self.conn.execute(
+                    "DELETE FROM held_writes WHERE sheet = ? AND seq <= ?",
+                    (name, stored[-1][1]))
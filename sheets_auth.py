@@ -0,0 +1,48 @@
+# Settings and credentials to allow access, read and modify data in
+# Google Sheets, shared by run.py and the sheets broker
+
+# threading library to authorize once across broker connections
+import threading
+
+# gspread library for the Google Sheets client
+import gspread
+from google.oauth2.service_account import Credentials
+
+# const for scopes of the google sheets and drive access
+SCOPE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive"
+    ]
+
+# const for untracked creds file
+CREDS_FILE = 'creds.json'
+
+# authorized gspread client, set on first use
+GSPREAD_CLIENT = None
+# const for lock held while the client is authorized
+CLIENT_LOCK = threading.Lock()
+
+
+def client():
+    """
+    Return the gspread client, authorized on first use and shared by
+    every spreadsheet opened after.
+    """
+    global GSPREAD_CLIENT
+
+    with CLIENT_LOCK:
+        if GSPREAD_CLIENT is None:
+            creds = Credentials.from_service_account_file(CREDS_FILE)
+            # credentials scope
+            scoped_creds = creds.with_scopes(SCOPE)
+            # auth of gspread client within these scoped credentials
+            GSPREAD_CLIENT = gspread.authorize(scoped_creds)
+        return GSPREAD_CLIENT
+
+
+def open_spreadsheet(name):
+    """
+    Open google sheet name with the shared gspread client.
+    """
+    return client().open(name)
@@ -0,0 +1,265 @@
+# Local broker that owns one authorized Google Sheets session and serves
+# the worksheet reads and writes of every run.py process on the server.
+# Run with: python3 sheets_broker.py (socket path from SOLAR_BROKER_SOCKET)
+
+# json library for the request and response lines
+import json
+
+# os library to read the socket path and remove a stale socket
+import os
+
+# socket library for the client connection
+import socket
+
+# socketserver library for the broker server
+import socketserver
+
+# threading library to share in-flight reads between connections
+import threading
+
+# Future to hand one read result to every waiting connection
+from concurrent.futures import Future
+
+# gspread exceptions raised by the Sheets API
+from gspread.exceptions import APIError, GSpreadException
+
+# request budget and retries shared by every connection
+from sheets_gateway import SheetsGateway
+
+# credentials and opening of a google sheet
+from sheets_auth import open_spreadsheet
+
+# const for broker socket path
+BROKER_SOCKET = os.environ.get("SOLAR_BROKER_SOCKET", "solar_broker.sock")
+
+# methods that only read data, identical concurrent reads are shared
+READ_METHODS = {"get_all_values", "col_values", "get", "get_lastUpdateTime"}
+# methods that change data
+WRITE_METHODS = {"append_row", "append_rows", "update", "batch_update"}
+
+
+class BrokerError(GSpreadException):
+    """
+    Error returned by the broker, status holds the Sheets API error code.
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class SheetsBroker:
+    """
+    Shared spreadsheet session used by every broker connection.
+    Every call goes through one gateway, so the request budget and
+    retries cover all the run.py processes together.
+    open_spreadsheet is called with the name of each spreadsheet used.
+    """
+
+    def __init__(self, open_spreadsheet, gateway=None):
+        self.open_spreadsheet = open_spreadsheet
+        self.gateway = gateway or SheetsGateway()
+        self.spreadsheets = {}
+        self.worksheets = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def target(self, name, sheet):
+        """
+        Return spreadsheet name, or its worksheet sheet, opened once.
+        """
+        with self.lock:
+            if name not in self.spreadsheets:
+                self.spreadsheets[name] = self.gateway.call(
+                    self.open_spreadsheet, name)
+            if sheet is None:
+                return self.spreadsheets[name]
+            if (name, sheet) not in self.worksheets:
+                self.worksheets[name, sheet] = self.gateway.call(
+                    self.spreadsheets[name].worksheet, sheet)
+            return self.worksheets[name, sheet]
+
+    def call(self, name, sheet, method, args):
+        """
+        Run method on sheet of spreadsheet name, sharing identical reads
+        already in flight.
+        """
+        if method not in READ_METHODS | WRITE_METHODS:
+            raise BrokerError(f"Method not allowed: {method}")
+
+        target = self.target(name, sheet)
+
+        if method in WRITE_METHODS:
+            # Reads started before the write must not be shared after it
+            with self.lock:
+                for key in [key for key in self.in_flight
+                            if key[0] == name and key[1] in (sheet, None)]:
+                    del self.in_flight[key]
+            return self.gateway.call(getattr(target, method), *args)
+
+        key = (name, sheet, method, json.dumps(args))
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+
+        if leader:
+            try:
+                future.set_result(
+                    self.gateway.call(getattr(target, method), *args))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    if self.in_flight.get(key) is future:
+                        del self.in_flight[key]
+
+        return future.result()
+
+
+class BrokerHandler(socketserver.StreamRequestHandler):
+    """
+    Serve the requests of one run.py connection, one JSON line each.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line)
+            try:
+                result = self.server.broker.call(
+                    request["spreadsheet"], request["sheet"],
+                    request["method"], request["args"])
+                response = {"result": result}
+            except APIError as e:
+                response = {"error": str(e), "status": e.code}
+            except (GSpreadException, OSError, ValueError) as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class BrokerServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Unix socket server with a thread per run.py connection.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, broker):
+        # Remove the socket left by a previous broker
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, BrokerHandler)
+        self.broker = broker
+
+
+class BrokerWorksheet:
+    """
+    Worksheet whose calls are sent to the broker.
+    """
+
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.title = title
+
+    def get_all_values(self):
+        """
+        Return every row of the worksheet.
+        """
+        return self.spreadsheet.call(self.title, "get_all_values")
+
+    def col_values(self, col):
+        """
+        Return the values of column col (starting at 1).
+        """
+        return self.spreadsheet.call(self.title, "col_values", col)
+
+    def get(self, range_name):
+        """
+        Return the rows of range_name.
+        """
+        return self.spreadsheet.call(self.title, "get", range_name)
+
+    def append_row(self, values):
+        """
+        Append the row values to the worksheet.
+        """
+        return self.spreadsheet.call(self.title, "append_row", values)
+
+    def append_rows(self, values):
+        """
+        Append the rows values to the worksheet.
+        """
+        return self.spreadsheet.call(self.title, "append_rows", values)
+
+    def update(self, values, range_name):
+        """
+        Write values to range_name.
+        """
+        return self.spreadsheet.call(
+            self.title, "update", values, range_name)
+
+    def batch_update(self, data):
+        """
+        Write several ranges in one request.
+        """
+        return self.spreadsheet.call(self.title, "batch_update", data)
+
+
+class BrokerSpreadsheet:
+    """
+    Spreadsheet name whose calls are sent to the broker over one
+    connection. Raises OSError if the broker is not running.
+    """
+
+    def __init__(self, path=BROKER_SOCKET, name=None):
+        self.name = name
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.file = self.sock.makefile("rwb")
+        self.lock = threading.Lock()
+
+    def call(self, sheet, method, *args):
+        """
+        Send one request to the broker and return its result.
+        """
+        request = {"spreadsheet": self.name, "sheet": sheet,
+                   "method": method, "args": list(args)}
+        with self.lock:
+            self.file.write(json.dumps(request).encode() + b"\n")
+            self.file.flush()
+            line = self.file.readline()
+
+        if not line:
+            raise BrokerError("Sheets broker closed the connection")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise BrokerError(response["error"], response.get("status"))
+        return response["result"]
+
+    def worksheet(self, title):
+        """
+        Return worksheet title of the spreadsheet.
+        """
+        return BrokerWorksheet(self, title)
+
+    def get_lastUpdateTime(self):
+        """
+        Return the spreadsheet last update time from Google Drive.
+        """
+        return self.call(None, "get_lastUpdateTime")
+
+
+def main():
+    """
+    Run the broker until it is stopped.
+    """
+    server = BrokerServer(BROKER_SOCKET, SheetsBroker(open_spreadsheet))
+    print(f"Sheets broker listening on {BROKER_SOCKET}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Gateway for every Google Sheets API call: keeps to a per-minute request
+# budget, retries rate limit and server errors with exponential backoff
+# and jitter, and counts the calls made, retried and throttled
+
+# os library to read the request budget
+import os
+
+# random library for the backoff jitter
+import random
+
+# threading library so concurrent callers share one budget
+import threading
+
+# time library to track the requests of the last minute
+import time
+
+# deque to keep the times of recent requests
+from collections import deque
+
+# requests exceptions raised when the connection fails
+from requests.exceptions import ConnectionError, Timeout
+
+# gspread exception raised by the Sheets API
+from gspread.exceptions import APIError
+
+# tracer of the time spent in Sheets calls
+from profiler import PROFILER
+
+# requests allowed in any 60 second window
+REQUESTS_PER_MINUTE = int(os.environ.get("SOLAR_REQUESTS_PER_MINUTE", "60"))
+
+# Sheets API status codes worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# retries of one call, and the first and longest wait between them
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 32.0
+
+
+class SheetsGateway:
+    """
+    Run Sheets API calls within the request budget, retrying failures
+    that are likely to pass on a later attempt.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE,
+                 max_retries=MAX_RETRIES):
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self.request_times = deque()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.retried = 0
+        self.throttled = 0
+
+    def wait_time(self):
+        """
+        Return the seconds until the budget has room for a request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            while self.request_times and now - self.request_times[0] >= 60:
+                self.request_times.popleft()
+
+            if len(self.request_times) < self.requests_per_minute:
+                return 0
+            return 60 - (now - self.request_times[0])
+
+    def acquire(self):
+        """
+        Use one request of the budget, waiting until one is free.
+        """
+        throttled = False
+        while True:
+            wait = self.wait_time()
+            if not wait:
+                with self.lock:
+                    # Another thread may have taken the free request
+                    if len(self.request_times) < self.requests_per_minute:
+                        self.request_times.append(time.monotonic())
+                        self.calls += 1
+                        return
+                continue
+
+            if not throttled:
+                throttled = True
+                self.throttled += 1
+            PROFILER.pause(wait)
+
+    def call(self, function, *args):
+        """
+        Run function(*args) as one Sheets API request.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                with PROFILER.span(function.__name__, "network"):
+                    return function(*args)
+            except APIError as e:
+                if (e.code not in RETRY_STATUSES
+                        or attempt == self.max_retries):
+                    raise
+            except (ConnectionError, Timeout):
+                if attempt == self.max_retries:
+                    raise
+
+            # Full jitter keeps retrying processes from calling together
+            delay = min(MAX_DELAY, BASE_DELAY * 2 ** attempt)
+            PROFILER.pause(random.uniform(0, delay))
+            attempt += 1
+            self.retried += 1
+
+    def counters(self):
+        """
+        Return the number of calls made, retried and throttled.
+        """
+        return {
+            "calls": self.calls,
+            "retried": self.retried,
+            "throttled": self.throttled
+        }
@@ -0,0 +1,64 @@
+# Sites (households) the app keeps solar data for, each with its own
+# google sheet and local data files
+
+# json library to read the sites file
+import json
+
+# os library for the site data folders
+import os
+
+# const for sites file
+SITES_FILE = "sites.json"
+
+# const for site used when no sites file exists
+DEFAULT_SITE = "home"
+
+# const for google sheet of the default site
+DEFAULT_SHEET_NAME = "solar_system"
+
+# const for untracked folder holding the local files of other sites
+SITES_DIR = "site_data"
+
+
+def load_sites(path=SITES_FILE):
+    """
+    Load the google sheet name of each site from the sites file.
+    Without a sites file there is one site using the solar_system sheet.
+    """
+    if not os.path.exists(path):
+        return {DEFAULT_SITE: DEFAULT_SHEET_NAME}
+
+    with open(path, encoding="utf-8") as sites_file:
+        sites = json.load(sites_file)["sites"]
+    if not sites:
+        raise ValueError("The sites file needs at least one site.")
+    return {name: site["spreadsheet"] for name, site in sites.items()}
+
+
+def selected_site(sites, argv):
+    """
+    Return the site chosen with --site NAME or SOLAR_SITE, or the first
+    site of the sites file.
+    """
+    site = os.environ.get("SOLAR_SITE")
+    if "--site" in argv[:-1]:
+        site = argv[argv.index("--site") + 1]
+
+    if site is None:
+        return next(iter(sites))
+    if site not in sites:
+        raise ValueError(f"Unknown site {site}, sites are: "
+                         f"{', '.join(sites)}.")
+    return site
+
+
+def site_path(site, filename):
+    """
+    Return the path of a local data file of site. The default site keeps
+    its files in the app folder.
+    """
+    if site == DEFAULT_SITE:
+        return filename
+    folder = os.path.join(SITES_DIR, site)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, filename)
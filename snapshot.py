@@ -0,0 +1,208 @@
+# Typed columnar snapshot of the daily, monthly and payback data, one
+# binary file per column read back memory-mapped, so the data can be
+# analysed without fetching the sheet or parsing its text again
+
+# fcntl library to lock the snapshot between app processes
+import fcntl
+
+# json library for the versions of the sheets in the snapshot
+import json
+
+# os library for the column files
+import os
+
+# contextmanager to hold the snapshot lock
+from contextlib import contextmanager
+
+# numpy library for the memory-mapped columns
+import numpy as np
+
+# const for untracked snapshot directory
+SNAPSHOT_DIR = "snapshot"
+
+# columns of each table and the type of their values, dates are stored
+# as days (datetime64[D]) and months as months (datetime64[M]) since 1970
+TABLES = {
+    "daily": [
+        ("date", np.dtype("<i8")),
+        ("consumed", np.dtype("<f8")),
+        ("exported", np.dtype("<f8")),
+        ("imported", np.dtype("<f8"))
+        ],
+    "monthly": [
+        ("month", np.dtype("<i8")),
+        ("consumed", np.dtype("<f8")),
+        ("exported", np.dtype("<f8")),
+        ("imported", np.dtype("<f8")),
+        ("savings", np.dtype("<f8"))
+        ],
+    "payback": [
+        ("date", np.dtype("<i8")),
+        ("payback", np.dtype("<f8"))
+        ]
+    }
+
+# datetime64 type the stored integers of the date columns are read as
+DATE_TYPES = {"date": "datetime64[D]", "month": "datetime64[M]"}
+
+# const for file of the sheet version each table was taken from
+VERSIONS_FILE = "versions.json"
+
+
+class Snapshot:
+    """
+    Tables kept as one binary file per column, like the interval store.
+    New rows after the stored rows are appended, any other change
+    rewrites the table. Columns are read back memory-mapped, so loading
+    them copies nothing.
+
+    Each table records the version of the cached sheet it was taken from
+    (see SheetCache.version), a table with the current version holds the
+    same data as the sheet.
+    """
+
+    def __init__(self, path=SNAPSHOT_DIR):
+        self.path = path
+        for table in TABLES:
+            os.makedirs(os.path.join(path, table), exist_ok=True)
+        # Not while another process is appending to a table
+        with self.locked():
+            for table in TABLES:
+                self.repair(table)
+
+    def column_path(self, table, name):
+        """
+        Return the file path of column name of table.
+        """
+        return os.path.join(self.path, table, f"{name}.bin")
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold a lock shared by every app process while the snapshot
+        changes.
+        """
+        with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def length(self, table):
+        """
+        Return the number of complete rows in table.
+        """
+        return min(
+            os.path.getsize(self.column_path(table, name)) // dtype.itemsize
+            if os.path.exists(self.column_path(table, name)) else 0
+            for name, dtype in TABLES[table])
+
+    def repair(self, table):
+        """
+        Cut every column of table to the same length after an
+        interrupted append.
+        """
+        length = self.length(table)
+        for name, dtype in TABLES[table]:
+            with open(self.column_path(table, name), "ab") as column_file:
+                column_file.truncate(length * dtype.itemsize)
+
+    def columns(self, table):
+        """
+        Return each column of table as a read-only memory-mapped array,
+        with the date columns as datetime64 values.
+        """
+        length = self.length(table)
+        arrays = {}
+        for name, dtype in TABLES[table]:
+            if length:
+                column = np.memmap(self.column_path(table, name),
+                                   dtype=dtype, mode="r", shape=(length,))
+            else:
+                column = np.zeros(0, dtype=dtype)
+            if name in DATE_TYPES:
+                column = column.view(DATE_TYPES[name])
+            arrays[name] = column
+        return arrays
+
+    def versions(self):
+        """
+        Return the sheet version of each table.
+        """
+        try:
+            with open(os.path.join(self.path, VERSIONS_FILE),
+                      encoding="utf-8") as versions_file:
+                return json.load(versions_file)
+        except (OSError, ValueError):
+            return {}
+
+    def version(self, table):
+        """
+        Return the version of the sheet table was taken from, or None.
+        """
+        return self.versions().get(table)
+
+    def set_version(self, table, version):
+        """
+        Record the version of the sheet table was taken from.
+        """
+        versions = self.versions()
+        versions[table] = version
+        path = os.path.join(self.path, VERSIONS_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as versions_file:
+            json.dump(versions, versions_file)
+            versions_file.flush()
+            os.fsync(versions_file.fileno())
+        os.replace(path + ".tmp", path)
+
+    def update(self, table, values, version=None):
+        """
+        Bring table in line with values, a dict of the column arrays of
+        every row. Only the rows after the stored rows are written when
+        the stored rows are unchanged, otherwise the table is rewritten.
+        Records version as the sheet version of the table.
+        Returns the number of rows written.
+        """
+        values = {name: np.asarray(values[name]).astype(
+                      DATE_TYPES.get(name, dtype)).view(dtype)
+                  for name, dtype in TABLES[table]}
+        count = len(values[TABLES[table][0][0]])
+
+        with self.locked():
+            # Not trusted while it changes
+            self.set_version(table, None)
+
+            self.repair(table)
+            stored = self.columns(table)
+            length = self.length(table)
+            unchanged = length <= count and all(
+                np.array_equal(stored[name].view(dtype),
+                               values[name][:length],
+                               equal_nan=dtype.kind == "f")
+                for name, dtype in TABLES[table])
+
+            if unchanged:
+                start = length
+                mode = "ab"
+            else:
+                start = 0
+                mode = "wb"
+
+            for name, dtype in TABLES[table]:
+                # A rewritten column replaces the old file in one step,
+                # so tables mapped by other processes are left intact
+                path = self.column_path(table, name)
+                target = path if unchanged else path + ".tmp"
+                with open(target, mode) as column_file:
+                    values[name][start:].tofile(column_file)
+                    column_file.flush()
+                    os.fsync(column_file.fileno())
+            if not unchanged:
+                for name, dtype in TABLES[table]:
+                    path = self.column_path(table, name)
+                    os.replace(path + ".tmp", path)
+
+            self.set_version(table, version)
+
+        return count - start
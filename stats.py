@@ -0,0 +1,197 @@
+# Energy statistics kept up to date as daily data is added: totals of
+# any run of days, e.g. the last 7, 30 or 365 days or a calendar year,
+# from prefix sums, with the self-consumption and grid independence
+
+# date to convert between dates and day numbers
+from datetime import date
+
+# numpy library for the prefix sums
+import numpy as np
+
+# rolling windows shown in the statistics view, in days
+WINDOW_DAYS = [7, 30, 365]
+
+
+class EnergyStats:
+    """
+    Daily consumed, exported and imported energy saved in SQLite, with a
+    running total (a prefix sum) of every day from the first day in
+    memory. The total of any run of days is the difference of two
+    running totals, so windows and years take constant time. A day added
+    after the last day extends the running totals, a day changed or added
+    between them updates the totals after it.
+
+    lock, a re-entrant lock, is held while the totals are read or
+    changed, so it can share a connection with the refresh worker.
+    """
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_energy (
+                    day TEXT PRIMARY KEY,
+                    consumed REAL NOT NULL,
+                    exported REAL NOT NULL,
+                    imported REAL NOT NULL
+                )
+            """)
+        self.load()
+
+    def load(self):
+        """
+        Build the running totals from the saved days.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT day, consumed, exported, imported FROM daily_energy "
+                "ORDER BY day").fetchall()
+            # Changes when another app process saves days
+            self.data_version = self.conn.execute(
+                "PRAGMA data_version").fetchone()[0]
+
+        self.first = None
+        self.days = 0
+        # Running total before each day, the row after the last day is
+        # the total of every day; spare rows leave room to add days
+        self.prefix = np.zeros((1, 3))
+        if not rows:
+            return
+
+        ordinals = np.array([date.fromisoformat(row[0]).toordinal()
+                             for row in rows])
+        values = np.array([row[1:] for row in rows], dtype=float)
+        self.first = int(ordinals[0])
+        self.days = int(ordinals[-1]) - self.first + 1
+        daily = np.zeros((self.days, 3))
+        daily[ordinals - self.first] = values
+        self.prefix = np.zeros((2 * self.days + 1, 3))
+        np.cumsum(daily, axis=0, out=self.prefix[1:self.days + 1])
+
+    def reload_if_changed(self):
+        """
+        Load the days again if another app process saved days.
+        """
+        with self.lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self.data_version:
+                self.load()
+
+    def set_days(self, rows):
+        """
+        Save the consumed, exported and imported energy of each day in
+        rows, a list of (date, consumed, exported, imported), replacing
+        the days already saved.
+        """
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO daily_energy "
+                    "(day, consumed, exported, imported) VALUES (?, ?, ?, ?)",
+                    [(day.isoformat(), *map(float, values))
+                     for day, *values in rows])
+
+            ordinals = [day.toordinal() for day, *values in rows]
+            if ordinals and (self.first is None
+                             or min(ordinals) < self.first):
+                # A day before the first day moves every index, start again
+                self.load()
+                return
+            for ordinal, (day, *values) in zip(ordinals, rows):
+                self.set_day(ordinal, np.array(values, dtype=float))
+
+    def set_day(self, ordinal, values):
+        """
+        Update the running totals for the values of one day, on or after
+        the first day.
+        """
+        index = ordinal - self.first
+        if index >= self.days:
+            # Days between the last day and this day have no data
+            if index + 2 > len(self.prefix):
+                grown = np.zeros((2 * (index + 1) + 1, 3))
+                grown[:self.days + 1] = self.prefix[:self.days + 1]
+                self.prefix = grown
+            self.prefix[self.days + 1:index + 1] = self.prefix[self.days]
+            self.prefix[index + 1] = self.prefix[index] + values
+            self.days = index + 1
+            return
+
+        change = values - (self.prefix[index + 1] - self.prefix[index])
+        self.prefix[index + 1:self.days + 1] += change
+
+    def rebuild(self, dates, energy):
+        """
+        Replace every saved day with the dates (datetime64[D]) and their
+        consumed, exported and imported energy.
+        """
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM daily_energy")
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO daily_energy "
+                    "(day, consumed, exported, imported) VALUES (?, ?, ?, ?)",
+                    [(str(day), *map(float, values))
+                     for day, values in zip(dates, energy)])
+            self.load()
+
+    def last_day(self):
+        """
+        Return the last day with data, or None.
+        """
+        if self.first is None:
+            return None
+        return date.fromordinal(self.first + self.days - 1)
+
+    def total(self, first_day, last_day):
+        """
+        Return the consumed, exported and imported energy from first_day
+        to last_day, both included.
+        """
+        with self.lock:
+            if self.first is None:
+                return np.zeros(3)
+            start = min(max(first_day.toordinal() - self.first, 0), self.days)
+            end = min(max(last_day.toordinal() - self.first + 1, 0),
+                      self.days)
+            if end <= start:
+                return np.zeros(3)
+            return self.prefix[end] - self.prefix[start]
+
+    def window(self, days):
+        """
+        Return the totals of the last days ending on the last day.
+        """
+        last = self.last_day()
+        if last is None:
+            return np.zeros(3)
+        return self.total(date.fromordinal(last.toordinal() - days + 1),
+                          last)
+
+    def years(self):
+        """
+        Return the totals of each calendar year with data.
+        """
+        last = self.last_day()
+        if last is None:
+            return {}
+        first = date.fromordinal(self.first)
+        return {year: self.total(date(year, 1, 1), date(year, 12, 31))
+                for year in range(first.year, last.year + 1)}
+
+
+def energy_ratios(totals):
+    """
+    Return the self-consumed energy (consumed less imported), the
+    self-consumption (share of the energy generated used at home) and
+    the grid independence (share of the energy consumed that was not
+    imported) of consumed, exported and imported totals. A ratio without
+    energy to divide by is None.
+    """
+    consumed, exported, imported = totals
+    self_consumed = consumed - imported
+    generated = self_consumed + exported
+    self_consumption = self_consumed / generated if generated > 0 else None
+    independence = self_consumed / consumed if consumed > 0 else None
+    return self_consumed, self_consumption, independence
@@ -0,0 +1,77 @@
+# Electricity tariff used to calculate savings, with dated rate periods,
+# day/night/peak time-of-use bands and an export rate
+
+# json library to read the tariff file
+import json
+
+# numpy library for vectorized rates and savings
+import numpy as np
+
+# const for tariff file
+TARIFF_FILE = "tariff.json"
+
+# time-of-use bands a period can have
+BANDS = ["day", "night", "peak"]
+
+
+class Tariff:
+    """
+    Dated tariff periods, each in force from its start date until the
+    next period starts. Dates before the first period use its rates.
+
+    Each band has a rate (€ per kW) and the share of the energy supplied
+    by the solar system that would otherwise be bought in that band.
+    """
+
+    def __init__(self, periods):
+        if not periods:
+            raise ValueError("The tariff needs at least one rate period.")
+
+        self.periods = sorted(periods, key=lambda period: period["start"])
+        self.starts = np.array([period["start"] for period in self.periods],
+                               dtype="datetime64[D]")
+        self.buy_rates = np.array([buy_rate(period)
+                                   for period in self.periods])
+        self.export_rates = np.array([float(period["export_rate"])
+                                      for period in self.periods])
+
+    def period_index(self, dates):
+        """
+        Return the index of the period in force on each date.
+        """
+        index = np.searchsorted(self.starts, dates, side="right") - 1
+        return np.maximum(index, 0)
+
+    def savings(self, dates, consumed, exported, imported):
+        """
+        Calculate the savings of each day with the rates of its period.
+        """
+        index = self.period_index(dates)
+        return ((consumed - imported) * self.buy_rates[index]
+                + exported * self.export_rates[index])
+
+
+def buy_rate(period):
+    """
+    Return the buy rate of a period, weighted by the share of each band.
+    """
+    bands = period["bands"]
+    unknown = set(bands) - set(BANDS)
+    if unknown:
+        raise ValueError(f"Unknown tariff bands: {', '.join(unknown)}.")
+
+    shares = sum(float(band["share"]) for band in bands.values())
+    if abs(shares - 1) > 0.001:
+        raise ValueError(f"Tariff band shares from {period['start']} "
+                         f"add up to {shares}, they must add up to 1.")
+
+    return sum(float(band["rate"]) * float(band["share"])
+               for band in bands.values())
+
+
+def load_tariff(path=TARIFF_FILE):
+    """
+    Load the tariff periods from the tariff file.
+    """
+    with open(path, encoding="utf-8") as tariff_file:
+        return Tariff(json.load(tariff_file)["periods"])
@@ -0,0 +1,133 @@
+const Pty = require('node-pty');
+
+// Pool of warm python3 run.py workers. Each worker is started with
+// --pooled, imports its libraries, authorizes the Google Sheets client and
+// prints READY_MARKER, then waits until a websocket connection claims it.
+// A claimed worker goes straight to the main menu, without the splash.
+
+const READY_MARKER = 'SOLAR_WORKER_READY';
+
+const POOL_SIZE = parseInt(process.env.WORKER_POOL_SIZE || '2');
+const IDLE_MS = parseInt(process.env.WORKER_IDLE_MS || '1800000');
+const REAP_INTERVAL_MS = 60000;
+const RESPAWN_DELAY_MS = 1000;
+
+// Workers that keep failing to start are replaced after a delay doubling
+// from RESPAWN_DELAY_MS up to RESPAWN_MAX_DELAY_MS, and the pool stops
+// replacing them after MAX_RESPAWNS failures in a row
+const RESPAWN_MAX_DELAY_MS = 60000;
+const MAX_RESPAWNS = parseInt(process.env.WORKER_MAX_RESPAWNS || '8');
+
+var idle = [];
+var reaper = null;
+var failures = 0;
+var respawnTimer = null;
+
+function spawnWorker() {
+
+    var worker = { ready: false, claimed: false, buffer: '', readyAt: null };
+
+    worker.tty = Pty.spawn('python3', ['run.py', '--pooled', '--no-splash'], {
+        name: 'xterm-color',
+        cols: 80,
+        rows: 24,
+        cwd: process.env.PWD,
+        env: process.env
+    });
+
+    worker.tty.on('data', function (data) {
+        if (!worker.ready) {
+            // Drop warm-up output, forward everything after the marker
+            worker.buffer += data;
+            var index = worker.buffer.indexOf(READY_MARKER);
+            if (index === -1)
+                return;
+            worker.ready = true;
+            worker.readyAt = Date.now();
+            failures = 0;
+            data = worker.buffer.substring(index + READY_MARKER.length).replace(/^\r?\n/, '');
+            worker.buffer = '';
+            if (!data)
+                return;
+        }
+        worker.claimed && worker.onData(data);
+    });
+
+    worker.tty.on('exit', function (code, signal) {
+        worker.tty = null;
+        var index = idle.indexOf(worker);
+        if (index !== -1) {
+            idle.splice(index, 1);
+            respawn(worker.ready);
+        }
+        worker.claimed && worker.onExit(code, signal);
+    });
+
+    return worker;
+}
+
+// Replace a worker that left the pool, waiting longer after each worker
+// in a row that failed to start
+function respawn(started) {
+
+    if (!started)
+        failures++;
+    if (failures >= MAX_RESPAWNS) {
+        console.error('Worker pool: ' + failures + ' workers failed to start, no longer replacing them');
+        return;
+    }
+    if (respawnTimer)
+        return;
+
+    var delay = Math.min(RESPAWN_DELAY_MS * Math.pow(2, Math.max(failures - 1, 0)), RESPAWN_MAX_DELAY_MS);
+    respawnTimer = setTimeout(function () {
+        respawnTimer = null;
+        fill();
+    }, delay);
+}
+
+function fill() {
+    // Connections still get a worker of their own, see claim
+    if (failures >= MAX_RESPAWNS)
+        return;
+    while (idle.length < POOL_SIZE)
+        idle.push(spawnWorker());
+}
+
+function reap() {
+    // Replace workers left idle too long so their OAuth tokens stay fresh
+    var now = Date.now();
+    idle.slice().forEach(function (worker) {
+        if (worker.ready && now - worker.readyAt > IDLE_MS)
+            worker.tty && worker.tty.kill(9);
+    });
+}
+
+exports.start = function () {
+    fill();
+    if (!reaper && IDLE_MS > 0)
+        reaper = setInterval(reap, REAP_INTERVAL_MS);
+};
+
+// Claim a worker for a new connection. onData receives the terminal
+// output and onExit is called when the python process ends.
+exports.claim = function (onData, onExit) {
+
+    // Prefer a worker that has finished warming up
+    var index = idle.findIndex(function (worker) {
+        return worker.ready;
+    });
+
+    var worker = index === -1 ? (idle.length ? idle.shift() : spawnWorker()) : idle.splice(index, 1)[0];
+
+    worker.claimed = true;
+    worker.onData = onData;
+    worker.onExit = onExit;
+    fill();
+
+    // Release the worker from wait_for_claim in run.py
+    worker.tty.write('\r');
+    return worker.tty;
+};
+
+exports.READY_MARKER = READY_MARKER;